@@ -6,6 +6,7 @@ let buttons = document.querySelectorAll("button");
 let load = 0;
 let process = null;
 let uploadedFileName = null; 
+let uploadedId = null;
 let uploadedSheetName = null;  
 
 
@@ -76,6 +77,7 @@ function uploadFile(file) {
             });
         } else {
             uploadedFileName = data.file_name; 
+            uploadedId = data.upload_id;
             startUploadProgress();
         }
     })
@@ -140,7 +142,7 @@ function confirmProcessing() {
         headers: {
             "Content-Type": "application/json"
         },
-       body: JSON.stringify({ file_name: uploadedFileName})
+       body: JSON.stringify({ file_name: uploadedFileName, upload_id: uploadedId})
     })
     .then(response => response.json())
     .then(data => {
@@ -151,6 +153,23 @@ function confirmProcessing() {
                 text: data.error
             });
         } else {
+            pollJobStatus(data.status_url);
+        }
+    })
+    .catch(error => console.error("Error:", error));    
+}
+
+function pollJobStatus(statusUrl) {
+    fetch(statusUrl)
+    .then(response => response.json())
+    .then(data => {
+        if (data.status === "failed") {
+            Swal.fire({
+                icon: 'error',
+                title: 'Processing Error',
+                text: data.error
+            });
+        } else if (data.status === "done") {
             uploadedSheetName = data.sheet_name;
             Swal.fire({
                 icon: 'success',
@@ -160,9 +179,14 @@ function confirmProcessing() {
             }).then(() => {
                 window.location.href = data.redirect_url; 
             });
+        } else {
+            Swal.update({
+                text: `Processed ${data.rows_processed} rows (${data.rows_inserted} new, ${data.duplicates} duplicates, ${data.errors} errors)...`
+            });
+            setTimeout(() => pollJobStatus(statusUrl), 1000);
         }
     })
-    .catch(error => console.error("Error:", error));    
+    .catch(error => console.error("Error:", error));
 }
 
 
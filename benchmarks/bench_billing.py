@@ -0,0 +1,72 @@
+"""
+Compare the row-wise 'Hours Worked' computation generate_invoice used to do
+with parse_frame + the vectorized add_billing_columns.
+
+    python benchmarks/bench_billing.py [rows ...]
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'revenue_collection_web.settings')
+
+import django
+
+django.setup()
+
+from bill_rate_system.ingest import add_billing_columns
+from bill_rate_system.validation import parse_frame
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    start = rng.integers(6 * 60, 12 * 60, rows)
+    end = start + rng.integers(30, 9 * 60, rows)
+    return pd.DataFrame({
+        'Employee ID': rng.integers(1, 500, rows),
+        'Billable Rate': rng.integers(20, 200, rows),
+        'Project': rng.choice([f'Project {i}' for i in range(50)], rows),
+        'Date': '2024-02-14',
+        'Start Time': [f'{m // 60:02d}:{m % 60:02d}' for m in start],
+        'End Time': [f'{m // 60:02d}:{m % 60:02d}' for m in end],
+    })
+
+
+def row_wise(df):
+    df['Start Time'] = pd.to_datetime(df['Start Time'], format='%H:%M', errors='coerce').dt.time
+    df['End Time'] = pd.to_datetime(df['End Time'], format='%H:%M', errors='coerce').dt.time
+    df = df.dropna(subset=['Start Time', 'End Time']).copy()
+    df['Hours Worked'] = df.apply(
+        lambda row: (datetime.combine(datetime.min, row['End Time']) -
+                     datetime.combine(datetime.min, row['Start Time'])).seconds / 3600, axis=1)
+    df['Cost'] = df['Hours Worked'] * df['Billable Rate']
+    return df
+
+
+def vectorized(df):
+    return add_billing_columns(parse_frame(df))
+
+
+def timed(func, df):
+    started = time.perf_counter()
+    result = func(df.copy())
+    return time.perf_counter() - started, result
+
+
+def main(sizes):
+    for rows in sizes:
+        df = make_frame(rows)
+        legacy_seconds, legacy = timed(row_wise, df)
+        vector_seconds, vector = timed(vectorized, df)
+        assert np.allclose(legacy['Cost'].to_numpy(), vector['cost'].to_numpy())
+        print(f"{rows:>9} rows  row-wise {legacy_seconds:8.3f}s  vectorized {vector_seconds:8.3f}s  "
+              f"speedup {legacy_seconds / vector_seconds:6.1f}x")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000])
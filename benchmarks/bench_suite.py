@@ -0,0 +1,209 @@
+"""
+Time the upload, ingest and invoice paths on synthetic timesheet CSVs.
+
+    python benchmarks/bench_suite.py [--sizes 1000 100000 ...] [--output results.json]
+                                     [--baseline previous.json] [--tolerance 0.25]
+
+Every size runs against a fresh SQLite database in a temporary directory.
+Wall time and peak resident memory are recorded for each step and written
+as JSON. With --baseline the run exits with status 1 when a step is slower
+than in the baseline by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = tempfile.mkdtemp(prefix="bench_suite_")
+
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'revenue_collection_web.settings')
+os.environ['DB_NAME'] = os.path.join(WORK_DIR, 'bench.sqlite3')
+os.environ['INVOICE_CACHE_LOCATION'] = os.path.join(WORK_DIR, 'cache')
+os.environ['INGEST_JOBS_EAGER'] = 'True'
+
+import django
+
+django.setup()
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from bill_rate_system.cache import invalidate_projects
+from bill_rate_system.models import IngestJob, Project
+from bill_rate_system.views import generate_invoice
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+PROJECTS = 50
+DAYS = 365
+# Cardinality of a real workforce: a few rows per employee per week.
+ROWS_PER_EMPLOYEE = 200
+MIN_DELTA_SECONDS = 0.05
+SAMPLE_INTERVAL = 0.01
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+CLOCK = [f'{m // 60:02d}:{m % 60:02d}' for m in range(24 * 60)]
+
+
+def write_csv(path, rows, seed=0):
+    """Write ``rows`` synthetic timesheet rows; each employee keeps one rate and one project."""
+    rng = np.random.default_rng(seed)
+    employees = max(10, rows // ROWS_PER_EMPLOYEE)
+    employee = rng.integers(1, employees + 1, rows)
+    start = rng.integers(6 * 60, 12 * 60, rows)
+    end = start + rng.integers(30, 9 * 60, rows)
+    dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, DAYS, rows), unit='D')
+    clock = np.array(CLOCK, dtype=object)
+    pd.DataFrame({
+        'Employee ID': employee,
+        'Billable Rate': 20 + (employee * 37) % 180,
+        'Project': np.array([f'Project {i}' for i in range(PROJECTS)], dtype=object)[employee % PROJECTS],
+        'Date': dates.strftime('%Y-%m-%d'),
+        'Start Time': clock[start],
+        'End Time': clock[end],
+    }).to_csv(path, index=False)
+
+
+def rss_bytes():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+def measure(func):
+    """
+    Run ``func`` and return its result, wall time and peak resident memory in MB.
+
+    Memory is sampled from a thread rather than traced, which would slow the
+    ORM-heavy steps down several times and distort their timings.
+    """
+    peak = rss_bytes()
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not done.wait(SAMPLE_INTERVAL):
+            peak = max(peak, rss_bytes())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        result = func()
+    finally:
+        seconds = time.perf_counter() - started
+        done.set()
+        sampler.join()
+    return result, seconds, max(peak, rss_bytes()) / 2 ** 20
+
+
+def reset_database():
+    call_command('flush', interactive=False, verbosity=0)
+    invalidate_projects()
+    Project.objects.bulk_create([Project(name=f'Project {i}') for i in range(PROJECTS)])
+    client = Client()
+    client.force_login(User.objects.create_user(username='bench', password='bench'))
+    return client
+
+
+def run_size(rows):
+    client = reset_database()
+    file_name = f'bench_{rows}.csv'
+    path = os.path.join(WORK_DIR, file_name)
+    write_csv(path, rows)
+    results = []
+
+    def record(step, func):
+        result, seconds, peak_mb = measure(func)
+        results.append({'rows': rows, 'step': step, 'seconds': round(seconds, 4), 'peak_rss_mb': round(peak_mb, 1)})
+        print(f"{rows:>9} rows  {step:<18} {seconds:9.3f}s  {peak_mb:9.1f} MB peak RSS")
+        return result
+
+    def upload():
+        with open(path, 'rb') as f:
+            return client.post(reverse('bill_rate_system:upload_temp_file'), {'file': f}).json()
+
+    upload_response = record('upload_temp_file', upload)
+    if 'error' in upload_response:
+        raise SystemExit(f"Upload of {file_name} was rejected: {upload_response['error']}")
+
+    record('process_file', lambda: client.post(
+        reverse('bill_rate_system:process_file'), json.dumps(upload_response), content_type='application/json'
+    ))
+    job = IngestJob.objects.latest('id')
+    if job.status != IngestJob.DONE:
+        raise SystemExit(f"Ingest of {file_name} failed: {job.error}")
+
+    df = pd.read_csv(path)
+    record('generate_invoice', lambda: generate_invoice(df))
+    del df
+
+    record('invoice_details', lambda: client.get(
+        reverse('bill_rate_system:invoice_details', args=[job.sheet.name, 'Project 0'])
+    ))
+    record('timesheets', lambda: client.get(reverse('bill_rate_system:timesheets')))
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    """Return the steps slower than in ``baseline`` by more than ``tolerance`` (a fraction)."""
+    previous = {(entry['rows'], entry['step']): entry for entry in baseline['results']}
+    slower = []
+    for entry in results:
+        before = previous.get((entry['rows'], entry['step']))
+        if before is None:
+            continue
+        if entry['seconds'] > before['seconds'] * (1 + tolerance) and entry['seconds'] - before['seconds'] > MIN_DELTA_SECONDS:
+            slower.append(f"{entry['rows']} rows {entry['step']}: {before['seconds']:.3f}s -> {entry['seconds']:.3f}s")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'results.json'))
+    parser.add_argument('--baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    call_command('migrate', verbosity=0)
+    # Uploads are written relative to the working directory.
+    os.chdir(WORK_DIR)
+    try:
+        results = [entry for rows in args.sizes for entry in run_size(rows)]
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': results,
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(results, json.load(f), args.tolerance)
+        for line in slower:
+            print(f"REGRESSION {line}")
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,61 @@
 from django.contrib import admin
-from bill_rate_system.models import Project,Timesheet
+from django.db.models import Max, Min
+from bill_rate_system.aggregates import rebuild_aggregates
+from bill_rate_system.revenue import rebuild_daily_revenue
+from bill_rate_system.models import Project,Sheet,Timesheet,IngestJob
 
 
-admin.site.register(Timesheet)
-admin.site.register(Project)
\ No newline at end of file
+def date_range(timesheets):
+    """Return the first and last date of ``timesheets``, or None when there are none."""
+    dates = timesheets.aggregate(start=Min('date'), end=Max('date'))
+    return (dates['start'], dates['end']) if dates['start'] else None
+
+
+class TimesheetAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        previous_sheet, previous_date = (
+            Timesheet.objects.filter(pk=obj.pk).values_list('sheet_id', 'date').first() or (None, None)
+        )
+        super().save_model(request, obj, form, change)
+        for sheet_id in {previous_sheet, obj.sheet_id} - {None}:
+            rebuild_aggregates(sheet_id)
+        for day in {previous_date, obj.date} - {None}:
+            rebuild_daily_revenue(day, day)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        rebuild_aggregates(obj.sheet_id)
+        rebuild_daily_revenue(obj.date, obj.date)
+
+    def delete_queryset(self, request, queryset):
+        sheet_ids = set(queryset.values_list('sheet_id', flat=True))
+        dates = date_range(queryset)
+        super().delete_queryset(request, queryset)
+        for sheet_id in sheet_ids:
+            rebuild_aggregates(sheet_id)
+        if dates:
+            rebuild_daily_revenue(*dates)
+
+
+class SheetAdmin(admin.ModelAdmin):
+    list_display = ('name', 'file_name', 'uploaded_by', 'row_count', 'created_at')
+    readonly_fields = ('row_count', 'content_hash')
+
+    # Deleting a sheet deletes its timesheets, which the daily revenue counts.
+    def delete_model(self, request, obj):
+        dates = date_range(obj.timesheets.all())
+        super().delete_model(request, obj)
+        if dates:
+            rebuild_daily_revenue(*dates)
+
+    def delete_queryset(self, request, queryset):
+        dates = date_range(Timesheet.objects.filter(sheet__in=queryset))
+        super().delete_queryset(request, queryset)
+        if dates:
+            rebuild_daily_revenue(*dates)
+
+
+admin.site.register(Timesheet, TimesheetAdmin)
+admin.site.register(Sheet, SheetAdmin)
+admin.site.register(Project)
+admin.site.register(IngestJob)
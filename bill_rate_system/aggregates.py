@@ -0,0 +1,119 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import BigIntegerField, Count, F, OuterRef, Subquery, Sum
+
+from bill_rate_system.models import InvoiceAggregate, Sheet, Timesheet
+
+AGGREGATE_BATCH_SIZE = 500
+
+
+def timesheet_deltas(timesheets, sign=1):
+    """
+    Return the change ``timesheets`` make to the invoice aggregates.
+
+    Keys are ``(sheet_id, project_id, employee_id)`` and values are
+    ``(rows, minutes, rate_minutes, rate)``. Use ``sign=-1`` for rows being
+    removed or for the state of a row before it is edited.
+    """
+    deltas = {}
+    for timesheet in timesheets:
+        key = (int(timesheet.sheet_id), int(timesheet.project_id), int(timesheet.employee_id))
+        minutes = timesheet.duration_minutes
+        rows, total_minutes, rate_minutes, latest_rate = deltas.get(key, (0, 0, Decimal(0), None))
+        deltas[key] = (
+            rows + sign,
+            total_minutes + sign * minutes,
+            rate_minutes + Decimal(sign * timesheet.rate_cents * minutes) / 100,
+            Decimal(timesheet.rate_cents) / 100 if sign > 0 else latest_rate,
+        )
+    return deltas
+
+
+def apply_deltas(*delta_maps):
+    """
+    Add each delta map to the stored aggregates, creating and removing rows as needed.
+
+    The row counts of the sheets involved are adjusted too.
+    """
+    keys = {key for deltas in delta_maps for key in deltas}
+    if not keys:
+        return
+
+    with transaction.atomic():
+        existing = {
+            (aggregate.sheet_id, aggregate.project_id, aggregate.employee_id): aggregate
+            for aggregate in InvoiceAggregate.objects.select_for_update().filter(
+                sheet_id__in={key[0] for key in keys},
+                project_id__in={key[1] for key in keys},
+                employee_id__in={key[2] for key in keys},
+            )
+        }
+        changed = {}
+        sheet_rows = {}
+        for deltas in delta_maps:
+            for key, (rows, minutes, rate_minutes, rate) in deltas.items():
+                sheet_rows[key[0]] = sheet_rows.get(key[0], 0) + rows
+                aggregate = changed.get(key) or existing.get(key)
+                if aggregate is None:
+                    aggregate = InvoiceAggregate(sheet_id=key[0], project_id=key[1], employee_id=key[2])
+                aggregate.row_count += rows
+                aggregate.total_minutes += minutes
+                aggregate.rate_minutes += rate_minutes
+                if rate is not None:
+                    aggregate.billable_rate = rate
+                changed[key] = aggregate
+
+        # Changed rows are deleted and inserted again: bulk_update builds a CASE
+        # per row and field, which gets slow with thousands of employees.
+        stored = [aggregate.pk for aggregate in changed.values() if aggregate.pk]
+        for start in range(0, len(stored), AGGREGATE_BATCH_SIZE):
+            InvoiceAggregate.objects.filter(pk__in=stored[start:start + AGGREGATE_BATCH_SIZE]).delete()
+        remaining = []
+        for aggregate in changed.values():
+            if aggregate.row_count > 0:
+                aggregate.pk = None
+                remaining.append(aggregate)
+        InvoiceAggregate.objects.bulk_create(remaining, batch_size=AGGREGATE_BATCH_SIZE)
+
+        for sheet_id, rows in sheet_rows.items():
+            if rows:
+                Sheet.objects.filter(pk=sheet_id).update(row_count=F('row_count') + rows)
+
+
+def timesheet_totals(timesheets):
+    """
+    Group ``timesheets`` per sheet, project and employee in the database.
+
+    Returns one row per group, so the result size depends on the number of
+    employees rather than on the number of timesheet rows. The cost is summed
+    as integer cents x minutes.
+    """
+    latest_rate = Timesheet.objects.filter(
+        sheet_id=OuterRef('sheet_id'), project_id=OuterRef('project_id'), employee_id=OuterRef('employee_id')
+    ).order_by('-id').values('billable_rate')[:1]
+    return timesheets.values('sheet_id', 'project_id', 'employee_id').annotate(
+        row_count=Count('id'),
+        total_minutes=Sum('duration_minutes'),
+        rate_cent_minutes=Sum(F('rate_cents') * F('duration_minutes'), output_field=BigIntegerField()),
+        unit_price=Subquery(latest_rate),
+    ).order_by()
+
+
+def rebuild_aggregates(sheet_id):
+    """Recompute every aggregate of the sheet ``sheet_id``, and its row count, from its timesheets."""
+    with transaction.atomic():
+        InvoiceAggregate.objects.filter(sheet_id=sheet_id).delete()
+        aggregates = InvoiceAggregate.objects.bulk_create([
+            InvoiceAggregate(
+                sheet_id=row['sheet_id'],
+                project_id=row['project_id'],
+                employee_id=row['employee_id'],
+                row_count=row['row_count'],
+                total_minutes=row['total_minutes'],
+                rate_minutes=Decimal(row['rate_cent_minutes']) / 100,
+                billable_rate=row['unit_price'],
+            )
+            for row in timesheet_totals(Timesheet.objects.filter(sheet_id=sheet_id))
+        ])
+        Sheet.objects.filter(pk=sheet_id).update(row_count=sum(aggregate.row_count for aggregate in aggregates))
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BillRateSystemConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bill_rate_system'
+
+    def ready(self):
+        from bill_rate_system import signals  # noqa: F401
@@ -0,0 +1,105 @@
+import logging
+import os
+import shutil
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing import get_context
+
+from django.conf import settings
+
+from bill_rate_system.cache import registered_projects
+from bill_rate_system.ingest import CHUNK_SIZE
+from bill_rate_system.uploads import UPLOAD_DIR, discard_parsed, new_upload_id, validate_saved_file
+
+logger = logging.getLogger('views_logger')
+
+
+def partial_path(upload_id):
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.part")
+
+
+def save_batch_files(files):
+    """
+    Save the CSV files of a batch, extracting the CSV members of any zip archive.
+
+    Each file is written to its own ``<upload_id>.part`` file, so files with
+    the same name, in the batch or from earlier uploads, never overwrite each
+    other. Returns ``(name, upload_id)`` per saved file, where zip members are
+    named by their path in the archive, and ``(name, error)`` per file that
+    was not saved.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    saved, rejected = [], []
+    try:
+        for file in files:
+            if file.name.endswith('.csv'):
+                upload_id = new_upload_id()
+                saved.append((file.name, upload_id))
+                with open(partial_path(upload_id), "wb") as destination:
+                    for chunk in file.chunks():
+                        destination.write(chunk)
+            elif file.name.endswith('.zip'):
+                try:
+                    with zipfile.ZipFile(file) as archive:
+                        for member in archive.infolist():
+                            name = os.path.basename(member.filename)
+                            if member.is_dir() or not name.endswith('.csv') or member.filename.startswith('__MACOSX'):
+                                continue
+                            upload_id = new_upload_id()
+                            saved.append((member.filename, upload_id))
+                            with archive.open(member) as source, open(partial_path(upload_id), "wb") as destination:
+                                shutil.copyfileobj(source, destination)
+                except zipfile.BadZipFile:
+                    rejected.append((file.name, "Invalid zip archive."))
+            else:
+                rejected.append((file.name, "Only CSV files or zip archives of CSV files are allowed!"))
+    except Exception:
+        # Files saved before the error would never be validated or removed.
+        for _, upload_id in saved:
+            discard_batch_file(upload_id)
+        raise
+    return saved, rejected
+
+
+def publish_batch_file(name, upload_id):
+    """
+    Move a validated batch file from its partial path to the name it is ingested from.
+
+    The upload id is part of the name, so it cannot replace another upload.
+    Only the base name is kept, so zip members cannot be written outside
+    UPLOAD_DIR. Returns the published file name.
+    """
+    file_name = f"{upload_id}_{os.path.basename(name)}"
+    os.replace(partial_path(upload_id), os.path.join(UPLOAD_DIR, file_name))
+    return file_name
+
+
+def discard_batch_file(upload_id):
+    """Remove a batch file that was not published, and any parsed chunks of it."""
+    if os.path.exists(partial_path(upload_id)):
+        os.remove(partial_path(upload_id))
+        discard_parsed(upload_id)
+
+
+def validate_batch(upload_ids):
+    """
+    Validate the saved files in parallel, one process per file up to BATCH_WORKERS.
+
+    Returns the error of each file in the order given; the error is None for
+    files whose parsed chunks were stored for ingestion.
+    """
+    paths = [partial_path(upload_id) for upload_id in upload_ids]
+    arguments = (paths, upload_ids, repeat(registered_projects()), repeat(CHUNK_SIZE))
+
+    workers = min(settings.BATCH_WORKERS, len(paths))
+    if workers <= 1:
+        errors = list(map(validate_saved_file, *arguments))
+    else:
+        # Workers are spawned rather than forked so they do not inherit the
+        # server's threads, locks or database connections.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            errors = list(pool.map(validate_saved_file, *arguments))
+
+    logger.info(f"Validated {len(paths)} batch files with {max(workers, 1)} workers.")
+    return errors
@@ -0,0 +1,246 @@
+from datetime import date, time
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+import pandas as pd
+from django.db import transaction
+
+from bill_rate_system.aggregates import apply_deltas, timesheet_deltas
+from bill_rate_system.cache import project_ids
+from bill_rate_system.models import Timesheet
+from bill_rate_system.revenue import apply_daily_deltas, daily_deltas
+from bill_rate_system.validation import MAX_VALIDATION_ERRORS, time_minutes
+
+BULK_EDIT_BATCH_SIZE = 500
+MAX_BULK_EDIT_ROWS = 50000
+ROW_FIELDS = ('id', 'sheet_id', 'project_id', 'employee_id', 'date', 'start_time', 'end_time',
+              'billable_rate', 'duration_minutes', 'rate_cents')
+UNIQUE_KEY = ['employee_id', 'project_id', 'date', 'start_minutes', 'end_minutes']
+
+
+def _project_id(name):
+    name = str(name).strip().title()
+    return project_ids([name]).get(name)
+
+
+def _minutes(value):
+    minutes = time_minutes(pd.Series([value])).iloc[0]
+    return None if pd.isna(minutes) else int(minutes)
+
+
+def _time(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+def select_timesheets(filters):
+    """
+    Return the timesheets matching ``filters`` and a list of errors.
+
+    Accepted filters are ``ids``, ``sheet_name``, ``project``, ``employee_ids``,
+    ``date_from`` and ``date_to``; at least one is required so that a missing
+    filter never edits every row.
+    """
+    errors = []
+    timesheets = Timesheet.objects.all()
+    if not isinstance(filters, dict) or not filters:
+        return timesheets.none(), ["At least one filter is required."]
+
+    unknown = set(filters) - {'ids', 'sheet_name', 'project', 'employee_ids', 'date_from', 'date_to'}
+    if unknown:
+        errors.append(f"Unknown filters: {', '.join(sorted(unknown))}.")
+    for key, lookup in (('ids', 'pk__in'), ('employee_ids', 'employee_id__in')):
+        if key in filters:
+            values = filters[key]
+            if not isinstance(values, list) or not all(isinstance(value, int) for value in values):
+                errors.append(f"'{key}' must be a list of integers.")
+            else:
+                timesheets = timesheets.filter(**{lookup: values})
+    if 'sheet_name' in filters:
+        timesheets = timesheets.filter(sheet__name=filters['sheet_name'])
+    if 'project' in filters:
+        project_id = _project_id(filters['project'])
+        if project_id is None:
+            errors.append(f"Unknown project: {filters['project']}.")
+        timesheets = timesheets.filter(project_id=project_id)
+    for key, lookup in (('date_from', 'date__gte'), ('date_to', 'date__lte')):
+        if key in filters:
+            try:
+                timesheets = timesheets.filter(**{lookup: date.fromisoformat(str(filters[key]))})
+            except ValueError:
+                errors.append(f"'{key}' must be a date in YYYY-MM-DD format.")
+    return timesheets, errors
+
+
+def parse_changes(changes):
+    """
+    Validate the requested field changes once, before any row is loaded.
+
+    Accepted changes are ``billable_rate``, ``project`` (a name), ``date_shift``
+    (whole days, may be negative), ``start_time`` and ``end_time``. Returns the
+    parsed values and a list of errors.
+    """
+    if not isinstance(changes, dict) or not changes:
+        return {}, ["At least one change is required."]
+
+    values, errors = {}, []
+    unknown = set(changes) - {'billable_rate', 'project', 'date_shift', 'start_time', 'end_time'}
+    if unknown:
+        errors.append(f"Unknown changes: {', '.join(sorted(unknown))}.")
+    if 'billable_rate' in changes:
+        try:
+            rate = Decimal(str(changes['billable_rate'])).quantize(Decimal('0.01'), ROUND_HALF_UP)
+        except InvalidOperation:
+            rate = None
+        if rate is None or not rate.is_finite() or rate <= 0:
+            errors.append(f"Invalid Billable Rate ({changes['billable_rate']}).")
+        else:
+            values['billable_rate'] = rate
+    if 'project' in changes:
+        project_id = _project_id(changes['project'])
+        if project_id is None:
+            errors.append(f"Unknown project: {changes['project']}.")
+        else:
+            values['project_id'] = project_id
+    if 'date_shift' in changes:
+        if not isinstance(changes['date_shift'], int) or isinstance(changes['date_shift'], bool):
+            errors.append("'date_shift' must be a whole number of days.")
+        elif changes['date_shift']:
+            values['date_shift'] = changes['date_shift']
+    for key in ('start_time', 'end_time'):
+        if key in changes:
+            minutes = _minutes(changes[key])
+            if minutes is None:
+                errors.append(f"Invalid {key.replace('_', ' ').title()} format. Accepted formats: HH:MM (24-hour), HH:MM AM/PM.")
+            else:
+                values[key.replace('time', 'minutes')] = minutes
+    return values, errors
+
+
+def _edited_frame(rows, values):
+    """Apply ``values`` to the frame of stored ``rows`` and return the new frame."""
+    edited = rows.copy()
+    if 'billable_rate' in values:
+        edited['billable_rate'] = values['billable_rate']
+        edited['rate_cents'] = int(values['billable_rate'] * 100)
+    if 'project_id' in values:
+        edited['project_id'] = values['project_id']
+    if 'date_shift' in values:
+        edited['date'] = (pd.to_datetime(edited['date']) + pd.Timedelta(days=values['date_shift'])).dt.date
+    if 'start_minutes' in values:
+        edited['start_minutes'] = values['start_minutes']
+    if 'end_minutes' in values:
+        edited['end_minutes'] = values['end_minutes']
+    edited['duration_minutes'] = edited['end_minutes'] - edited['start_minutes']
+    return edited
+
+
+def _edit_errors(edited, limit=MAX_VALIDATION_ERRORS):
+    errors = [
+        f"End Time must be after Start Time for timesheet {pk}."
+        for pk in edited.loc[edited['duration_minutes'] <= 0, 'id'].head(limit)
+    ]
+    clashing = edited.loc[edited.duplicated(subset=UNIQUE_KEY, keep=False), 'id'].head(limit - len(errors))
+    errors.extend(f"Timesheet {pk} would duplicate another edited timesheet." for pk in clashing)
+    return errors
+
+
+def _update_waves(rows, edited):
+    """
+    Split the edited rows into groups that can each be written at once.
+
+    The unique key is checked row by row during an UPDATE, so a row cannot
+    take the key another selected row still holds, as when consecutive days
+    are shifted by one. Such a row goes in the group after the row holding
+    its new key. The same change is applied to every row, so these chains
+    never loop.
+    """
+    holders = dict(zip(rows[UNIQUE_KEY].itertuples(index=False, name=None), rows['id']))
+    blocked_by = {}
+    for pk, key in zip(edited['id'], edited[UNIQUE_KEY].itertuples(index=False, name=None)):
+        holder = holders.get(key)
+        if holder is not None and holder != pk:
+            blocked_by[pk] = holder
+
+    waves = {}
+    for pk in edited['id']:
+        chain = []
+        while pk not in waves and pk in blocked_by:
+            chain.append(pk)
+            pk = blocked_by[pk]
+        wave = waves.setdefault(pk, 0)
+        for step, blocked in enumerate(reversed(chain), 1):
+            waves[blocked] = wave + step
+    return [group for _, group in edited.groupby(edited['id'].map(waves), sort=True)]
+
+
+def bulk_edit_timesheets(timesheets, values):
+    """
+    Apply the parsed ``values`` to every row of ``timesheets`` in one transaction.
+
+    The rows are loaded once into a frame, the new values are computed and
+    checked for all of them together, and the changes are written in batches:
+    with one ``update()`` per batch when every row gets the same values, or
+    with ``bulk_update`` when they depend on each row (date shifts, or a start
+    or end time changed on its own), in an order that lets selected rows take
+    each other's dates. The invoice aggregates and the daily
+    revenue are adjusted by the difference. Returns the number of rows edited and a list of errors;
+    nothing is written when there are errors.
+
+    Raises IntegrityError when an edited row would duplicate a row outside
+    the selection.
+    """
+    with transaction.atomic():
+        rows = pd.DataFrame.from_records(
+            timesheets.select_for_update().order_by('id').values_list(*ROW_FIELDS)[:MAX_BULK_EDIT_ROWS + 1],
+            columns=ROW_FIELDS,
+        )
+        if rows.empty:
+            return 0, []
+        if len(rows) > MAX_BULK_EDIT_ROWS:
+            return 0, [f"The filters select more than {MAX_BULK_EDIT_ROWS} timesheets. Narrow them down."]
+
+        rows['start_minutes'] = [value.hour * 60 + value.minute for value in rows['start_time']]
+        rows['end_minutes'] = [value.hour * 60 + value.minute for value in rows['end_time']]
+        edited = _edited_frame(rows, values)
+        errors = _edit_errors(edited)
+        if errors:
+            return 0, errors
+
+        previous = timesheet_deltas(rows.itertuples(index=False), sign=-1)
+        previous_daily = daily_deltas(rows.itertuples(index=False), sign=-1)
+        ids = rows['id'].tolist()
+        per_row = 'date_shift' in values or ('start_minutes' in values) != ('end_minutes' in values)
+        if per_row:
+            fields = ['duration_minutes', *(
+                field for field, key in (
+                    ('billable_rate', 'billable_rate'), ('rate_cents', 'billable_rate'), ('project_id', 'project_id'),
+                    ('date', 'date_shift'), ('start_time', 'start_minutes'), ('end_time', 'end_minutes'),
+                ) if key in values
+            )]
+            for wave in _update_waves(rows, edited):
+                Timesheet.objects.bulk_update([
+                    Timesheet(
+                        id=row.id, project_id=row.project_id, billable_rate=row.billable_rate,
+                        rate_cents=row.rate_cents, date=row.date, start_time=_time(row.start_minutes),
+                        end_time=_time(row.end_minutes), duration_minutes=row.duration_minutes,
+                    )
+                    for row in wave.itertuples(index=False)
+                ], fields, batch_size=BULK_EDIT_BATCH_SIZE)
+        else:
+            first = edited.iloc[0]
+            update = {}
+            if 'billable_rate' in values:
+                update.update(billable_rate=values['billable_rate'], rate_cents=int(first['rate_cents']))
+            if 'project_id' in values:
+                update['project_id'] = values['project_id']
+            if 'start_minutes' in values:
+                update.update(
+                    start_time=_time(values['start_minutes']),
+                    end_time=_time(values['end_minutes']),
+                    duration_minutes=int(first['duration_minutes']),
+                )
+            for start in range(0, len(ids), BULK_EDIT_BATCH_SIZE):
+                Timesheet.objects.filter(pk__in=ids[start:start + BULK_EDIT_BATCH_SIZE]).update(**update)
+
+        apply_deltas(previous, timesheet_deltas(edited.itertuples(index=False)))
+        apply_daily_deltas(previous_daily, daily_deltas(edited.itertuples(index=False)))
+    return len(ids), []
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from django.core.cache import caches
+
+from bill_rate_system.models import Project
+
+INVOICE_CACHE = "invoices"
+PROJECT_CACHE_TTL = 300
+
+_projects = None
+_projects_loaded_at = 0
+_projects_generation = 0
+_projects_lock = threading.Lock()
+
+
+def invoice_key(job_id):
+    return f"invoice:job:{job_id}"
+
+
+def store_invoice(key, invoice_data):
+    caches[INVOICE_CACHE].set(key, invoice_data)
+
+
+def load_invoice(key):
+    """Return the invoice stored under ``key``, or an empty dict once it has expired or been evicted."""
+    if not key:
+        return {}
+    return caches[INVOICE_CACHE].get(key) or {}
+
+
+def invalidate_projects():
+    """Drop the cached project map so the next lookup reloads it."""
+    global _projects, _projects_generation
+    with _projects_lock:
+        _projects = None
+        _projects_generation += 1
+
+
+def _load_projects():
+    global _projects, _projects_loaded_at
+    with _projects_lock:
+        generation = _projects_generation
+    projects = dict(Project.objects.values_list('name', 'id'))
+    with _projects_lock:
+        # A change committed while loading invalidates what was just read.
+        if generation == _projects_generation:
+            _projects = projects
+            _projects_loaded_at = time.monotonic()
+    return projects
+
+
+def project_ids(names):
+    """
+    Map each of ``names`` that is a registered project to its id.
+
+    The name to id map is cached per process. Other processes do not see this
+    process's invalidations, so the map also expires after PROJECT_CACHE_TTL
+    seconds and is reloaded once whenever a name is missing from it.
+    """
+    projects = _projects
+    if projects is None or time.monotonic() - _projects_loaded_at > PROJECT_CACHE_TTL:
+        projects = _load_projects()
+    elif any(name not in projects for name in names):
+        projects = _load_projects()
+    return {name: projects[name] for name in names if name in projects}
+
+
+def registered_projects():
+    """
+    Reload and return the whole name to id map, for code that cannot query the database.
+
+    A missing name cannot trigger a reload there, so the map is always fresh.
+    """
+    return dict(_load_projects())
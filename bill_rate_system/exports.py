@@ -0,0 +1,61 @@
+import csv
+
+from django.http import StreamingHttpResponse
+
+from bill_rate_system.models import InvoiceAggregate
+from bill_rate_system.validation import REQUIRED_COLUMNS
+
+EXPORT_CHUNK_SIZE = 2000
+INVOICE_COLUMNS = ['Project', 'Employee ID', 'Hours Worked', 'Unit Price', 'Cost']
+
+
+class Echo:
+    """File-like object whose write returns the value, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def csv_response(file_name, header, rows):
+    """Stream ``header`` and ``rows`` as a CSV attachment, formatting one row at a time."""
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{file_name}"'
+    return response
+
+
+def timesheet_rows(timesheets):
+    """
+    Yield ``timesheets`` in the upload CSV layout, fetched ``EXPORT_CHUNK_SIZE`` rows at a time.
+
+    The server-side cursor keeps memory flat however many rows match, and the
+    output can be uploaded again as is.
+    """
+    rows = timesheets.order_by('id').values_list(
+        'employee_id', 'billable_rate', 'project__name', 'date', 'start_time', 'end_time'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for employee_id, rate, project, day, start, end in rows:
+        yield employee_id, rate, project, day.isoformat(), start.strftime('%H:%M'), end.strftime('%H:%M')
+
+
+def invoice_rows(sheet_name):
+    """Yield one invoice line per project and employee of ``sheet_name`` from the stored aggregates."""
+    aggregates = InvoiceAggregate.objects.filter(sheet__name=sheet_name).select_related('project').order_by(
+        'project__name', 'employee_id'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for aggregate in aggregates:
+        yield aggregate.project.name, aggregate.employee_id, aggregate.hours_worked, aggregate.billable_rate, aggregate.cost
+
+
+def export_timesheets_csv(timesheets, file_name):
+    return csv_response(file_name, REQUIRED_COLUMNS, timesheet_rows(timesheets))
+
+
+def export_invoice_csv(sheet_name, file_name):
+    return csv_response(file_name, INVOICE_COLUMNS, invoice_rows(sheet_name))
@@ -0,0 +1,254 @@
+import logging
+import threading
+from datetime import time
+
+import numpy as np
+import pandas as pd
+
+from bill_rate_system.aggregates import apply_deltas, timesheet_deltas
+from bill_rate_system.cache import project_ids
+from bill_rate_system.metrics import stage
+from django.db import transaction
+
+from bill_rate_system.models import Project, Timesheet
+from bill_rate_system.revenue import apply_daily_deltas, daily_deltas
+from bill_rate_system.validation import duration_minutes, normalize_project_names, parse_frame
+
+logger = logging.getLogger('views_logger')
+
+INSERT_BATCH_SIZE = 1000
+CHUNK_SIZE = 50000
+MAX_REPORTED_ERRORS = 1000
+
+_write_lock = threading.Lock()
+
+
+def read_csv_chunks(source, chunksize=CHUNK_SIZE):
+    """Read a CSV path or file object lazily, ``chunksize`` rows at a time."""
+    return pd.read_csv(source, chunksize=chunksize)
+
+
+def parsed_csv_chunks(source, chunksize=CHUNK_SIZE):
+    for chunk in read_csv_chunks(source, chunksize):
+        yield parse_frame(chunk)
+
+
+def resolve_projects(names):
+    """Map each normalized project name to its id using the cached project map."""
+    return project_ids(set(names))
+
+
+def minutes_to_time(minutes):
+    minutes = int(minutes)
+    return time(minutes // 60, minutes % 60)
+
+
+def _existing_keys(keys):
+    """Return the subset of ``keys`` already stored, using one query for the whole batch."""
+    employee_ids = {key[0] for key in keys}
+    project_ids = {key[1] for key in keys}
+    dates = [key[2] for key in keys]
+    existing = Timesheet.objects.filter(
+        employee_id__in=employee_ids,
+        project_id__in=project_ids,
+        date__range=(min(dates), max(dates)),
+    ).values_list('employee_id', 'project_id', 'date', 'start_time', 'end_time')
+    return set(existing) & set(keys)
+
+
+def insert_timesheets(typed, sheet, batch_size=INSERT_BATCH_SIZE, error_rows=None):
+    """
+    Insert the rows of ``typed`` (as returned by ``parse_frame``) that are not already stored into ``sheet``.
+
+    Projects come from the cached project map and duplicates are detected per batch,
+    so the number of queries grows with ``len(typed) / batch_size`` rather than
+    with the number of rows. The rows, their invoice aggregates and the revenue
+    rollups are written in one transaction, so a failure leaves none behind. Skipped rows are described in ``error_rows``, when
+    given, up to MAX_REPORTED_ERRORS entries. Returns ``(inserted, duplicates, errors)``.
+    """
+    # Batches of rows sorted by date span a day or two, so the duplicate lookup
+    # of each batch only reads the stored rows of those days.
+    typed = typed.sort_values(['date', 'employee_id'], kind='stable')
+    names = normalize_project_names(typed['project'])
+    project_ids = names.map(resolve_projects(names.dropna()))
+    dates = typed['date'].dt.date
+
+    inserted = duplicates = errors = 0
+    pending = {}
+    deltas = []
+    daily = []
+
+    def flush():
+        nonlocal inserted, duplicates
+        if not pending:
+            return
+        with stage('dedup'):
+            existing = _existing_keys(list(pending))
+        new_entries = [entry for key, entry in pending.items() if key not in existing]
+        with stage('insert'):
+            Timesheet.objects.bulk_create(new_entries, batch_size=batch_size, ignore_conflicts=True)
+        deltas.append(timesheet_deltas(new_entries))
+        daily.append(daily_deltas(new_entries))
+        inserted += len(new_entries)
+        duplicates += len(existing)
+        pending.clear()
+
+    rate_cents = np.rint(typed['billable_rate'] * 100)
+    rows = zip(typed.index, typed['employee_id'], typed['billable_rate'], rate_cents, names, project_ids, dates,
+               typed['start_minutes'], typed['end_minutes'])
+    # Jobs running at the same time can carry the same rows. The lock, and
+    # across processes the row locks on their projects, make the duplicate
+    # checks and the inserts one step, so no row is inserted or counted twice.
+    # The aggregates and rollups are updated in the same transaction, so they
+    # always commit together with the rows they count.
+    with _write_lock, transaction.atomic():
+        list(Project.objects.select_for_update().filter(
+            id__in=set(project_ids.dropna().astype(int))
+        ).order_by('id').values_list('id', flat=True))
+        for index, employee_id, rate, cents, name, project_id, day, start, end in rows:
+            invalid = pd.isna(project_id) or pd.isna(employee_id) or pd.isna(rate) or pd.isna(day) or pd.isna(start) or pd.isna(end)
+            # Files ingested without upload validation can hold shifts that end before they start.
+            duration = None if invalid else duration_minutes(start, end)
+            if duration is None:
+                errors += 1
+                if error_rows is not None and len(error_rows) < MAX_REPORTED_ERRORS:
+                    if pd.isna(project_id):
+                        reason = 'unknown project'
+                    elif invalid:
+                        reason = 'invalid employee ID, rate, date or time'
+                    else:
+                        reason = 'end time not after start time'
+                    error_rows.append({
+                        'row': int(index) + 1,
+                        'employee_id': None if pd.isna(employee_id) else int(employee_id),
+                        'project': None if pd.isna(name) else name,
+                        'reason': reason,
+                    })
+                continue
+
+            # Rows repeated across batches are caught by the lookup against rows
+            # already flushed, so only the current batch needs to be checked here.
+            key = (int(employee_id), int(project_id), day, minutes_to_time(start), minutes_to_time(end))
+            if key in pending:
+                duplicates += 1
+                continue
+
+            pending[key] = Timesheet(
+                employee_id=key[0],
+                billable_rate=rate,
+                project_id=key[1],
+                date=day,
+                start_time=key[3],
+                end_time=key[4],
+                sheet_id=sheet.id,
+                duration_minutes=int(duration),
+                rate_cents=int(cents),
+            )
+            if len(pending) >= batch_size:
+                flush()
+        flush()
+        # Batches touch mostly the same employees and days, so their aggregates
+        # and revenue rollups are updated once for the whole frame.
+        with stage('aggregate'):
+            apply_deltas(*deltas)
+            apply_daily_deltas(*daily)
+
+    return inserted, duplicates, errors
+
+
+def add_billing_columns(typed):
+    """
+    Return the rows of ``typed`` with valid times, with billing columns added.
+
+    'duration_minutes' and 'rate_cents' are integers, so sums of them are
+    exact. 'hours_worked' and 'cost' are derived from them.
+    """
+    durations = duration_minutes(typed['start_minutes'], typed['end_minutes'])
+    valid = (durations.notna() & typed['employee_id'].notna()).to_numpy()
+    df = typed[valid].astype({'employee_id': np.int64})
+
+    # Shifts that do not end after they start are not billed, as insert_timesheets skips them.
+    df['duration_minutes'] = durations[valid].astype(np.int64)
+    df['rate_cents'] = np.rint(df['billable_rate'] * 100).astype(np.int64)
+    df['cent_minutes'] = df['duration_minutes'] * df['rate_cents']
+    df['hours_worked'] = df['duration_minutes'] / 60
+    df['cost'] = df['cent_minutes'] / 6000
+    return df
+
+
+class InvoiceAccumulator:
+    """
+    Build the per project/employee invoice totals one chunk at a time.
+
+    Only the grouped totals are kept between chunks, so memory depends on the
+    number of project/employee pairs rather than on the number of rows. Totals
+    are kept in integer minutes and cent-minutes until ``invoice_data``.
+    """
+
+    def __init__(self):
+        self.totals = None
+
+    def add(self, typed):
+        df = add_billing_columns(typed).rename(columns={'project': 'Project', 'employee_id': 'Employee ID'})
+        partial = df.groupby(['Project', 'Employee ID']).agg(
+            minutes=('duration_minutes', 'sum'),
+            Unit_Price=('billable_rate', 'first'),
+            cent_minutes=('cent_minutes', 'sum')
+        )
+        if self.totals is not None:
+            partial = pd.concat([self.totals, partial]).groupby(level=['Project', 'Employee ID']).agg(
+                minutes=('minutes', 'sum'),
+                Unit_Price=('Unit_Price', 'first'),
+                cent_minutes=('cent_minutes', 'sum')
+            )
+        self.totals = partial
+
+    def invoice_data(self):
+        if self.totals is None:
+            return {}
+        grouped = self.totals.reset_index()
+        grouped = pd.DataFrame({
+            'Project': grouped['Project'],
+            'Employee ID': grouped['Employee ID'],
+            'Total_Hours': grouped['minutes'] / 60,
+            'Unit_Price': grouped['Unit_Price'],
+            'Total_Cost': grouped['cent_minutes'] / 6000,
+        })
+        return {
+            project: project_data.to_dict(orient='records')
+            for project, project_data in grouped.groupby('Project')
+        }
+
+
+def ingest_chunks(chunks, sheet, on_chunk=None, skip_rows=0, error_rows=None):
+    """
+    Insert typed chunks into ``sheet`` one at a time.
+
+    The first ``skip_rows`` rows of the file are already stored, so they are
+    only counted towards the invoice. ``on_chunk`` is called with the running
+    counters after every chunk, and skipped rows are described in
+    ``error_rows``. Logs one summary line per chunk. Returns the final
+    counters and the invoice data for all chunks.
+    """
+    counts = {'rows_processed': 0, 'rows_inserted': 0, 'duplicates': 0, 'errors': 0}
+    accumulator = InvoiceAccumulator()
+    for position, chunk in enumerate(chunks):
+        new_rows = chunk[chunk.index >= skip_rows] if skip_rows else chunk
+        inserted, duplicates, errors = insert_timesheets(new_rows, sheet, error_rows=error_rows)
+        logger.info(
+            f"Chunk {position + 1} of {sheet.name}: {len(new_rows)} rows, {inserted} inserted, "
+            f"{duplicates} duplicates, {errors} errors."
+        )
+        counts['rows_processed'] += len(new_rows)
+        counts['rows_inserted'] += inserted
+        counts['duplicates'] += duplicates
+        counts['errors'] += errors
+        accumulator.add(chunk)
+        if on_chunk is not None:
+            on_chunk(counts)
+    return counts, accumulator.invoice_data()
+
+
+def ingest_file(source, sheet, on_chunk=None, skip_rows=0, error_rows=None):
+    """Parse the CSV ``source`` chunk by chunk and ingest it with ``ingest_chunks``."""
+    return ingest_chunks(parsed_csv_chunks(source), sheet, on_chunk, skip_rows, error_rows)
@@ -0,0 +1,207 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from bill_rate_system.cache import invoice_key, load_invoice, store_invoice
+from bill_rate_system.ingest import InvoiceAccumulator, ingest_chunks, ingest_file, parsed_csv_chunks
+from bill_rate_system.models import IngestJob, Timesheet
+from bill_rate_system.profiling import run_profiled, should_sample
+from bill_rate_system.uploads import UPLOAD_DIR, discard_parsed, fingerprint, has_parsed, is_line_boundary, load_parsed_chunks
+
+logger = logging.getLogger('views_logger')
+
+POLL_INTERVAL = 5
+
+_wakeup = threading.Event()
+_worker_lock = threading.Lock()
+_worker = None
+
+
+def run_job(job_id):
+    """Ingest the file of a claimed job, recording progress on the job row as chunks complete."""
+    job = IngestJob.objects.select_related('sheet').get(pk=job_id)
+    logger.info(f"Ingest job {job_id} started for {job.file_name}.")
+
+    # update() does not touch auto_now fields, and updated_at is what tells a
+    # running job from one whose process died.
+    def record_progress(counts):
+        IngestJob.objects.filter(pk=job_id).update(updated_at=timezone.now(), **counts)
+
+    error_rows = []
+    try:
+        if job.sheet is None:
+            raise ValueError("The sheet of this job was deleted before it ran.")
+        if has_parsed(job.upload_id):
+            counts, invoice_data = ingest_chunks(
+                load_parsed_chunks(job.upload_id), job.sheet, record_progress, job.skip_rows, error_rows)
+            discard_parsed(job.upload_id)
+        else:
+            counts, invoice_data = ingest_file(
+                os.path.join(UPLOAD_DIR, job.file_name), job.sheet, record_progress, job.skip_rows, error_rows)
+        store_invoice(invoice_key(job_id), invoice_data)
+        IngestJob.objects.filter(pk=job_id).update(status=IngestJob.DONE, error_report=error_rows, **counts)
+        logger.info(f"Ingest job {job_id} finished: {counts}.")
+        if not counts['rows_inserted']:
+            delete_empty_sheet(job)
+    except Exception as e:
+        logger.error(f"Ingest job {job_id} failed: {e}", exc_info=True)
+        IngestJob.objects.filter(pk=job_id).update(status=IngestJob.FAILED, error=str(e))
+        delete_empty_sheet(job)
+
+
+def delete_empty_sheet(job):
+    """
+    Delete the sheet of ``job`` if it has no timesheets.
+
+    The sheet is created with the job; when the job failed or every row was
+    a duplicate or an error, it would only block its name.
+    """
+    if job.sheet is not None and not job.sheet.timesheets.exists():
+        job.sheet.delete()
+        logger.info(f"Deleted the empty sheet {job.sheet.name} of ingest job {job.id}.")
+
+
+def match_previous_upload(path, uploaded_by=None):
+    """
+    Fingerprint the file at ``path`` and find the jobs that already ingested its content.
+
+    Returns ``(content_hash, content_size, same, base)``. ``same`` is a
+    finished job of ``uploaded_by`` for identical content, as only its
+    uploader can read a job's status. ``base`` is the finished job whose
+    file is the longest prefix of this one ending on a complete row, so only
+    the rows after it are new. Only jobs whose sheet still has timesheets
+    count: once a sheet is deleted its file has to be ingested again.
+    """
+    done = IngestJob.objects.filter(
+        Exists(Timesheet.objects.filter(sheet_id=OuterRef('sheet_id'))), status=IngestJob.DONE,
+    ).exclude(content_hash='')
+    prefix_sizes = done.filter(content_size__lt=os.path.getsize(path)).values_list('content_size', flat=True).distinct()
+    content_hash, content_size, prefixes = fingerprint(path, prefix_sizes)
+
+    same = done.filter(content_hash=content_hash, uploaded_by=uploaded_by).order_by('-id').first()
+    if same is not None:
+        return content_hash, content_size, same, None
+
+    for prefix_size in sorted(prefixes, reverse=True):
+        base = done.filter(content_hash=prefixes[prefix_size], content_size=prefix_size).order_by('-id').first()
+        if base is not None and is_line_boundary(path, prefix_size):
+            return content_hash, content_size, None, base
+    return content_hash, content_size, None, None
+
+
+def restore_invoice(job_id, path, upload_id=""):
+    """
+    Store the invoice of the finished job ``job_id`` again once its cached copy has expired.
+
+    ``path`` holds the same content the job ingested; its parsed chunks are
+    used when ``upload_id`` still has them.
+    """
+    if load_invoice(invoice_key(job_id)):
+        return
+    accumulator = InvoiceAccumulator()
+    for chunk in load_parsed_chunks(upload_id) if has_parsed(upload_id) else parsed_csv_chunks(path):
+        accumulator.add(chunk)
+    store_invoice(invoice_key(job_id), accumulator.invoice_data())
+    logger.info(f"Recomputed the expired invoice of ingest job {job_id}.")
+
+
+def requeue_stale_jobs():
+    """
+    Move running jobs that have not recorded progress for INGEST_JOB_TIMEOUT seconds back to pending.
+
+    Their process stopped before finishing them. Rows they already inserted
+    are found by the duplicate check when the job runs again. Returns the
+    number of jobs requeued.
+    """
+    stale_before = timezone.now() - timedelta(seconds=settings.INGEST_JOB_TIMEOUT)
+    requeued = IngestJob.objects.filter(status=IngestJob.RUNNING, updated_at__lt=stale_before).update(
+        status=IngestJob.PENDING, updated_at=timezone.now())
+    if requeued:
+        logger.warning(f"Requeued {requeued} ingest jobs left running by a stopped worker.")
+    return requeued
+
+
+def claim_next_job():
+    """Atomically move the oldest pending job to running and return its id, or None."""
+    requeue_stale_jobs()
+    for job_id in IngestJob.objects.filter(status=IngestJob.PENDING).order_by('id').values_list('id', flat=True)[:10]:
+        if IngestJob.objects.filter(pk=job_id, status=IngestJob.PENDING).update(
+                status=IngestJob.RUNNING, updated_at=timezone.now()):
+            return job_id
+    return None
+
+
+class IngestWorker(threading.Thread):
+    """
+    Dispatch pending jobs from the IngestJob table to a local thread pool.
+
+    The table is the queue: jobs are claimed with a conditional update, so
+    several processes can each run a worker without picking the same job.
+    Every poll first requeues the jobs of workers that stopped, so a restart
+    picks up both those and the jobs still pending.
+    """
+
+    def __init__(self, max_workers):
+        super().__init__(name="ingest-worker", daemon=True)
+        self.slots = threading.Semaphore(max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+
+    def run(self):
+        while True:
+            self.slots.acquire()
+            try:
+                job_id = claim_next_job()
+            except Exception as e:
+                logger.error(f"Ingest worker could not poll for jobs: {e}", exc_info=True)
+                job_id = None
+            finally:
+                close_old_connections()
+
+            if job_id is None:
+                self.slots.release()
+                _wakeup.wait(POLL_INTERVAL)
+                _wakeup.clear()
+                continue
+
+            self.executor.submit(self.execute, job_id)
+
+    def execute(self, job_id):
+        try:
+            if should_sample():
+                run_profiled("run_job", run_job, job_id)
+            else:
+                run_job(job_id)
+        finally:
+            close_old_connections()
+            self.slots.release()
+            _wakeup.set()
+
+
+def start_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = IngestWorker(settings.INGEST_WORKERS)
+            _worker.start()
+
+
+def wake_worker():
+    """Start the background worker if this process has none, and make it poll now."""
+    start_worker()
+    _wakeup.set()
+
+
+def enqueue(job):
+    """Hand ``job`` to the background worker, or run it inline when INGEST_JOBS_EAGER is set."""
+    if settings.INGEST_JOBS_EAGER:
+        IngestJob.objects.filter(pk=job.pk).update(status=IngestJob.RUNNING)
+        run_job(job.pk)
+        return
+    wake_worker()
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bill_rate_system.aggregates import rebuild_aggregates
+from bill_rate_system.models import Sheet
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the invoice aggregates of the named sheets from their timesheets. "
+        "Without names, repairs every sheet that has timesheets but no aggregates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('sheet_names', nargs='*', help="Names of the sheets to rebuild.")
+        parser.add_argument('--all', action='store_true', help="Rebuild every sheet.")
+
+    def handle(self, *args, **options):
+        sheets = Sheet.objects.order_by('id')
+        if options['sheet_names']:
+            sheets = sheets.filter(name__in=options['sheet_names'])
+            missing = set(options['sheet_names']) - set(sheets.values_list('name', flat=True))
+            if missing:
+                raise CommandError(f"Unknown sheets: {', '.join(sorted(missing))}.")
+        elif not options['all']:
+            # Rows written outside the ingest and edit paths have no aggregates yet.
+            sheets = sheets.filter(timesheets__isnull=False, aggregates__isnull=True).distinct()
+
+        rebuilt = 0
+        for sheet in sheets:
+            rebuild_aggregates(sheet.id)
+            rebuilt += 1
+            self.stdout.write(f"Rebuilt the aggregates of {sheet.name}.")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} sheets."))
@@ -0,0 +1,88 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+BYTES_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format(number):
+    return repr(float(number)) if isinstance(number, float) else str(number)
+
+
+class Histogram:
+    """
+    A Prometheus histogram with one series per value of a single label.
+
+    Observations only update in-process counters; ``render`` writes them in
+    the text exposition format.
+    """
+
+    def __init__(self, name, documentation, label, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = {'buckets': [0] * len(self.buckets), 'sum': 0, 'count': 0}
+            position = bisect_left(self.buckets, value)
+            if position < len(self.buckets):
+                series['buckets'][position] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {value: dict(data, buckets=list(data['buckets'])) for value, data in self._series.items()}
+        for value, data in sorted(series.items()):
+            label = f'{self.label}="{_escape(value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, data['buckets']):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{_format(bound)}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {data["count"]}')
+            lines.append(f'{self.name}_sum{{{label}}} {_format(data["sum"])}')
+            lines.append(f'{self.name}_count{{{label}}} {data["count"]}')
+        return "\n".join(lines)
+
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Time to build the response, per view.', 'view', SECONDS_BUCKETS)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries run while building the response, per view.', 'view', COUNT_BUCKETS)
+REQUEST_DB_SECONDS = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in database queries, per view.', 'view', SECONDS_BUCKETS)
+RESPONSE_BYTES = Histogram(
+    'http_response_size_bytes', 'Size of non-streaming response bodies, per view.', 'view', BYTES_BUCKETS)
+STAGE_SECONDS = Histogram(
+    'pipeline_stage_duration_seconds', 'Time spent in each stage of the upload and ingest pipeline.', 'stage',
+    SECONDS_BUCKETS)
+
+REGISTRY = (REQUEST_SECONDS, REQUEST_QUERIES, REQUEST_DB_SECONDS, RESPONSE_BYTES, STAGE_SECONDS)
+
+
+@contextmanager
+def stage(name):
+    """Record the time spent in the block under the pipeline stage ``name``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(name, time.perf_counter() - started)
+
+
+def render():
+    return "\n".join(histogram.render() for histogram in REGISTRY) + "\n"
@@ -0,0 +1,49 @@
+import time
+
+from django.db import connection
+
+from bill_rate_system.metrics import REQUEST_DB_SECONDS, REQUEST_QUERIES, REQUEST_SECONDS, RESPONSE_BYTES
+
+
+class QueryTimer:
+    """Database execute wrapper that counts queries and the time spent running them."""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """
+    Record latency, query count, database time and response size per view.
+
+    Queries run while a streaming response is consumed happen after the view
+    returns and are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        REQUEST_SECONDS.observe(view, elapsed)
+        REQUEST_QUERIES.observe(view, timer.queries)
+        REQUEST_DB_SECONDS.observe(view, timer.seconds)
+        if not response.streaming:
+            RESPONSE_BYTES.observe(view, len(response.content))
+        return response
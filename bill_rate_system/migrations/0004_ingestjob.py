@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_rate_system', '0003_remove_project_status_remove_timesheet_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(max_length=255)),
+                ('sheet_name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('rows_processed', models.IntegerField(default=0)),
+                ('rows_inserted', models.IntegerField(default=0)),
+                ('duplicates', models.IntegerField(default=0)),
+                ('errors', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('invoice_data', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:40
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_aggregates(apps, schema_editor):
+    Timesheet = apps.get_model('bill_rate_system', 'Timesheet')
+    InvoiceAggregate = apps.get_model('bill_rate_system', 'InvoiceAggregate')
+
+    aggregates = {}
+    for timesheet in Timesheet.objects.order_by('id').iterator(chunk_size=2000):
+        key = (timesheet.sheet_name, timesheet.project_id, timesheet.employee_id)
+        aggregate = aggregates.get(key)
+        if aggregate is None:
+            aggregate = aggregates[key] = InvoiceAggregate(
+                sheet_name=key[0], project_id=key[1], employee_id=key[2], rate_minutes=Decimal(0)
+            )
+        minutes = ((timesheet.end_time.hour * 60 + timesheet.end_time.minute)
+                   - (timesheet.start_time.hour * 60 + timesheet.start_time.minute))
+        aggregate.row_count += 1
+        aggregate.total_minutes += minutes
+        aggregate.rate_minutes += timesheet.billable_rate * minutes
+        aggregate.billable_rate = timesheet.billable_rate
+    InvoiceAggregate.objects.bulk_create(aggregates.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_rate_system', '0004_ingestjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sheet_name', models.CharField(max_length=255)),
+                ('employee_id', models.IntegerField()),
+                ('row_count', models.IntegerField(default=0)),
+                ('total_minutes', models.BigIntegerField(default=0)),
+                ('rate_minutes', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('billable_rate', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bill_rate_system.project')),
+            ],
+            options={
+                'unique_together': {('sheet_name', 'project', 'employee_id')},
+            },
+        ),
+        migrations.RunPython(build_aggregates, migrations.RunPython.noop),
+    ]
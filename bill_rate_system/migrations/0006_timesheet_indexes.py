@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_rate_system', '0005_invoiceaggregate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timesheet',
+            index=models.Index(fields=['sheet_name', 'project'], name='timesheet_sheet_project_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timesheet',
+            index=models.Index(fields=['project', 'date'], name='timesheet_project_date_idx'),
+        ),
+    ]
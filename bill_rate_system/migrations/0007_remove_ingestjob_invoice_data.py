@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_rate_system', '0006_timesheet_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='ingestjob',
+            name='invoice_data',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_rate_system', '0007_remove_ingestjob_invoice_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestjob',
+            name='upload_id',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_rate_system', '0008_ingestjob_upload_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestjob',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='ingestjob',
+            name='content_size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ingestjob',
+            name='skip_rows',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:56
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Cast, ExtractHour, ExtractMinute, Round
+
+
+def fill_totals(apps, schema_editor):
+    Timesheet = apps.get_model('bill_rate_system', 'Timesheet')
+    Timesheet.objects.update(
+        duration_minutes=(ExtractHour('end_time') * 60 + ExtractMinute('end_time'))
+        - (ExtractHour('start_time') * 60 + ExtractMinute('start_time')),
+        rate_cents=Cast(Round(F('billable_rate') * 100), models.BigIntegerField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_rate_system', '0009_ingestjob_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timesheet',
+            name='duration_minutes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='timesheet',
+            name='rate_cents',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_rate_system', '0010_timesheet_duration_rate_cents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestjob',
+            name='error_report',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_rate_system', '0011_ingestjob_error_report'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sheet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('file_name', models.CharField(blank=True, max_length=255)),
+                ('content_hash', models.CharField(blank=True, max_length=64)),
+                ('row_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='timesheet',
+            name='sheet',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='timesheets', to='bill_rate_system.sheet'),
+        ),
+        migrations.AddField(
+            model_name='invoiceaggregate',
+            name='sheet',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='aggregates', to='bill_rate_system.sheet'),
+        ),
+        migrations.AddField(
+            model_name='ingestjob',
+            name='sheet',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='bill_rate_system.sheet'),
+        ),
+    ]
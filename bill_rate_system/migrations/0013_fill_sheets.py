@@ -0,0 +1,50 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:42
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def fill_sheets(apps, schema_editor):
+    Sheet = apps.get_model('bill_rate_system', 'Sheet')
+    Timesheet = apps.get_model('bill_rate_system', 'Timesheet')
+    InvoiceAggregate = apps.get_model('bill_rate_system', 'InvoiceAggregate')
+    IngestJob = apps.get_model('bill_rate_system', 'IngestJob')
+
+    jobs = {job.sheet_name: job for job in IngestJob.objects.order_by('id')}
+    names = set(Timesheet.objects.values_list('sheet_name', flat=True).distinct())
+    names |= set(InvoiceAggregate.objects.values_list('sheet_name', flat=True).distinct())
+    names |= set(jobs)
+    for name in sorted(names):
+        rows = Timesheet.objects.filter(sheet_name=name)
+        totals = rows.aggregate(row_count=Count('id'), created_at=Min('created_at'))
+        job = jobs.get(name)
+        sheet = Sheet.objects.create(
+            name=name,
+            file_name=job.file_name if job else '',
+            content_hash=job.content_hash if job else '',
+            row_count=totals['row_count'],
+        )
+        created_at = totals['created_at'] or (job.created_at if job else None)
+        if created_at:
+            Sheet.objects.filter(pk=sheet.pk).update(created_at=created_at)
+        rows.update(sheet=sheet)
+        InvoiceAggregate.objects.filter(sheet_name=name).update(sheet=sheet)
+        IngestJob.objects.filter(sheet_name=name).update(sheet=sheet)
+
+
+def fill_sheet_names(apps, schema_editor):
+    Sheet = apps.get_model('bill_rate_system', 'Sheet')
+    for sheet in Sheet.objects.all():
+        for model in ('Timesheet', 'InvoiceAggregate', 'IngestJob'):
+            apps.get_model('bill_rate_system', model).objects.filter(sheet=sheet).update(sheet_name=sheet.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_rate_system', '0012_sheet'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_sheets, fill_sheet_names),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_rate_system', '0013_fill_sheets'),
+    ]
+
+    operations = [
+        # A default lets the columns be added back, and then filled from the
+        # sheets, when this migration is reversed.
+        migrations.AlterField(
+            model_name='timesheet',
+            name='sheet_name',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='invoiceaggregate',
+            name='sheet_name',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='ingestjob',
+            name='sheet_name',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.RemoveIndex(
+            model_name='timesheet',
+            name='timesheet_sheet_project_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='invoiceaggregate',
+            unique_together={('sheet', 'project', 'employee_id')},
+        ),
+        migrations.RemoveField(
+            model_name='timesheet',
+            name='sheet_name',
+        ),
+        migrations.RemoveField(
+            model_name='invoiceaggregate',
+            name='sheet_name',
+        ),
+        migrations.RemoveField(
+            model_name='ingestjob',
+            name='sheet_name',
+        ),
+        migrations.AlterField(
+            model_name='timesheet',
+            name='sheet',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timesheets', to='bill_rate_system.sheet'),
+        ),
+        migrations.AlterField(
+            model_name='invoiceaggregate',
+            name='sheet',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aggregates', to='bill_rate_system.sheet'),
+        ),
+        migrations.AddIndex(
+            model_name='timesheet',
+            index=models.Index(fields=['sheet', 'project'], name='timesheet_sheet_project_idx'),
+        ),
+    ]
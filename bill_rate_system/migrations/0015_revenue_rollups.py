@@ -0,0 +1,70 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+BATCH_SIZE = 500
+
+
+def fill_revenue(apps, schema_editor):
+    Timesheet = apps.get_model('bill_rate_system', 'Timesheet')
+    DailyRevenue = apps.get_model('bill_rate_system', 'DailyRevenue')
+    totals = Timesheet.objects.values('project_id', 'employee_id', 'date').annotate(
+        row_count=Count('id'),
+        total_minutes=Sum('duration_minutes'),
+        rate_cent_minutes=Sum(F('rate_cents') * F('duration_minutes'), output_field=models.BigIntegerField()),
+    ).order_by()
+    DailyRevenue.objects.bulk_create((DailyRevenue(**row) for row in totals.iterator()), batch_size=BATCH_SIZE)
+
+    MonthlyRevenue = apps.get_model('bill_rate_system', 'MonthlyRevenue')
+    months = DailyRevenue.objects.annotate(month=TruncMonth('date')).values('project_id', 'employee_id', 'month').annotate(
+        row_count=Sum('row_count'),
+        total_minutes=Sum('total_minutes'),
+        rate_cent_minutes=Sum('rate_cent_minutes'),
+    ).order_by()
+    MonthlyRevenue.objects.bulk_create((MonthlyRevenue(**row) for row in months.iterator()), batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_rate_system', '0014_remove_sheet_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('employee_id', models.IntegerField()),
+                ('date', models.DateField()),
+                ('row_count', models.IntegerField(default=0)),
+                ('total_minutes', models.BigIntegerField(default=0)),
+                ('rate_cent_minutes', models.BigIntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bill_rate_system.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='dailyrevenue_date_idx')],
+                'unique_together': {('project', 'employee_id', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('employee_id', models.IntegerField()),
+                ('month', models.DateField()),
+                ('row_count', models.IntegerField(default=0)),
+                ('total_minutes', models.BigIntegerField(default=0)),
+                ('rate_cent_minutes', models.BigIntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bill_rate_system.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month'], name='monthlyrevenue_month_idx')],
+                'unique_together': {('project', 'employee_id', 'month')},
+            },
+        ),
+        migrations.RunPython(fill_revenue, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_uploaded_by(apps, schema_editor):
+    IngestJob = apps.get_model('bill_rate_system', 'IngestJob')
+    Sheet = apps.get_model('bill_rate_system', 'Sheet')
+    IngestJob.objects.filter(sheet__uploaded_by__isnull=False).update(
+        uploaded_by=Subquery(Sheet.objects.filter(pk=OuterRef('sheet_id')).values('uploaded_by')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_rate_system', '0015_revenue_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestjob',
+            name='uploaded_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(fill_uploaded_by, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,37 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
 
+from bill_rate_system.validation import duration_minutes
+
 class Project(models.Model):
     name = models.CharField(max_length=255, unique=True)
     
     def __str__(self):
         return self.name
 
+
+class Sheet(models.Model):
+    """
+    One uploaded timesheet file.
+
+    Timesheets and invoice aggregates point to their sheet, so renaming a
+    sheet updates this row only. ``row_count`` is kept up to date with the
+    invoice aggregates.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    file_name = models.CharField(max_length=255, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    row_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
 class Timesheet(models.Model):
     employee_id = models.IntegerField()
     billable_rate = models.DecimalField(max_digits=10, decimal_places=2)
@@ -13,15 +39,160 @@ class Timesheet(models.Model):
     date = models.DateField()
     start_time = models.TimeField()
     end_time = models.TimeField()
-    sheet_name = models.CharField(max_length=255)  
+    sheet = models.ForeignKey(Sheet, on_delete=models.CASCADE, related_name='timesheets')
     created_at=models.DateTimeField(auto_now_add=True)
+    duration_minutes = models.IntegerField(default=0)
+    rate_cents = models.BigIntegerField(default=0)
     
 
     class Meta:
         unique_together = ('employee_id', 'project', 'date', 'start_time', 'end_time')
+        indexes = [
+            models.Index(fields=['sheet', 'project'], name='timesheet_sheet_project_idx'),
+            models.Index(fields=['project', 'date'], name='timesheet_project_date_idx'),
+        ]
         
     def __str__(self):
-        return f"{self.sheet_name}--{self.created_at}"
+        return f"{self.sheet}--{self.created_at}"
+
+    def save(self, *args, **kwargs):
+        self.set_totals()
+        super().save(*args, **kwargs)
+
+    def clean(self):
+        super().clean()
+        if self.start_time is not None and self.end_time is not None and self._duration() is None:
+            raise ValidationError({'end_time': "End Time must be after Start Time."})
+
+    def _duration(self):
+        start = self._meta.get_field('start_time').to_python(self.start_time)
+        end = self._meta.get_field('end_time').to_python(self.end_time)
+        return duration_minutes(start.hour * 60 + start.minute, end.hour * 60 + end.minute)
+
+    def set_totals(self):
+        """
+        Fill duration_minutes and rate_cents from the times and the rate.
+
+        Raises ValueError when the end time is not after the start time.
+        """
+        duration = self._duration()
+        if duration is None:
+            raise ValueError("End Time must be after Start Time.")
+        self.duration_minutes = duration
+        self.rate_cents = int((Decimal(str(self.billable_rate)) * 100).to_integral_value(ROUND_HALF_UP))
     
 
  
+
+
+class IngestJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    file_name = models.CharField(max_length=255)
+    upload_id = models.CharField(max_length=32, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    content_size = models.BigIntegerField(default=0)
+    skip_rows = models.IntegerField(default=0)
+    sheet = models.ForeignKey(Sheet, null=True, on_delete=models.SET_NULL, related_name='jobs')
+    uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    rows_processed = models.IntegerField(default=0)
+    rows_inserted = models.IntegerField(default=0)
+    duplicates = models.IntegerField(default=0)
+    errors = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    error_report = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.file_name}--{self.status}"
+
+
+class InvoiceAggregate(models.Model):
+    """
+    Invoice totals for one employee on one project of a sheet.
+
+    Kept up to date as timesheets are inserted or edited. The cost is stored
+    as the sum of rate x minutes so incremental updates stay exact. Hours and
+    cost are rounded once from these totals, not row by row.
+    """
+    sheet = models.ForeignKey(Sheet, on_delete=models.CASCADE, related_name='aggregates')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    employee_id = models.IntegerField()
+    row_count = models.IntegerField(default=0)
+    total_minutes = models.BigIntegerField(default=0)
+    rate_minutes = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    billable_rate = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('sheet', 'project', 'employee_id')
+
+    @property
+    def hours_worked(self):
+        return round(self.total_minutes / 60, 2)
+
+    @property
+    def cost(self):
+        return (self.rate_minutes / 60).quantize(Decimal('0.01'))
+
+    def __str__(self):
+        return f"{self.sheet_id}--{self.project_id}--{self.employee_id}"
+
+
+class DailyRevenue(models.Model):
+    """
+    Minutes and cost of one employee on one project on one day, across all sheets.
+
+    Kept up to date as timesheets are inserted, edited or deleted, so date
+    range reports sum these rows instead of the timesheets. The cost is
+    stored as integer cents x minutes so the sums stay exact.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    employee_id = models.IntegerField()
+    date = models.DateField()
+    row_count = models.IntegerField(default=0)
+    total_minutes = models.BigIntegerField(default=0)
+    rate_cent_minutes = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('project', 'employee_id', 'date')
+        indexes = [
+            models.Index(fields=['date'], name='dailyrevenue_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date}--{self.project_id}--{self.employee_id}"
+
+
+class MonthlyRevenue(models.Model):
+    """
+    The daily revenue of one employee on one project summed over a month.
+
+    ``month`` is the first day of the month. Reports read whole months from
+    here and only the days of partial months from DailyRevenue.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    employee_id = models.IntegerField()
+    month = models.DateField()
+    row_count = models.IntegerField(default=0)
+    total_minutes = models.BigIntegerField(default=0)
+    rate_cent_minutes = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('project', 'employee_id', 'month')
+        indexes = [
+            models.Index(fields=['month'], name='monthlyrevenue_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}--{self.project_id}--{self.employee_id}"
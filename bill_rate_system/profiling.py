@@ -0,0 +1,98 @@
+import cProfile
+import logging
+import os
+import pstats
+import random
+import re
+from datetime import datetime
+from functools import wraps
+
+from django.conf import settings
+
+logger = logging.getLogger('views_logger')
+
+PROFILE_HEADER = "X-Profile"
+TOP_FUNCTIONS = 40
+
+_PROFILE_NAME = re.compile(r'^[a-z_]+-\d{8}T\d{12}\.prof$')
+
+
+def should_sample():
+    return settings.PROFILING_ENABLED and random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+def run_profiled(name, func, *args, **kwargs):
+    """Call ``func`` under cProfile and save the profile as ``<name>-<timestamp>.prof`` in PROFILE_DIR."""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Only one profiler can be active at a time on newer Pythons.
+        return func(*args, **kwargs)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        file_name = f"{name}-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}.prof"
+        profiler.dump_stats(os.path.join(settings.PROFILE_DIR, file_name))
+        logger.info(f"Saved profile {file_name}.")
+
+
+def profiled(view):
+    """
+    Profile a sampled share of calls to ``view``, or every call from staff sending the X-Profile header.
+
+    Sampling is off unless PROFILING_ENABLED is set; PROFILING_SAMPLE_RATE is
+    the share of calls profiled.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        requested = request.headers.get(PROFILE_HEADER) and request.user.is_staff
+        if requested or should_sample():
+            return run_profiled(view.__name__, view, request, *args, **kwargs)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def list_profiles():
+    """Return the saved profiles, newest first, as dicts with name, view, taken_at and size."""
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(settings.PROFILE_DIR):
+        if not _PROFILE_NAME.match(name):
+            continue
+        view, stamp = name[:-len('.prof')].rsplit('-', 1)
+        profiles.append({
+            'name': name,
+            'view': view,
+            'taken_at': datetime.strptime(stamp, '%Y%m%dT%H%M%S%f'),
+            'size': os.path.getsize(os.path.join(settings.PROFILE_DIR, name)),
+        })
+    return sorted(profiles, key=lambda profile: profile['taken_at'], reverse=True)
+
+
+def top_functions(name, sort='cumulative', limit=TOP_FUNCTIONS):
+    """
+    Return the total time of profile ``name`` and its ``limit`` most expensive functions.
+
+    Raises FileNotFoundError for names that are not saved profiles.
+    """
+    path = os.path.join(settings.PROFILE_DIR, name)
+    if not _PROFILE_NAME.match(name) or not os.path.exists(path):
+        raise FileNotFoundError(name)
+    stats = pstats.Stats(path)
+    position = 3 if sort == 'cumulative' else 2
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][position], reverse=True)[:limit]
+    functions = [
+        {
+            'function': pstats.func_std_string(func),
+            'calls': calls,
+            'primitive_calls': primitive_calls,
+            'total_time': total_time,
+            'cumulative_time': cumulative_time,
+        }
+        for func, (primitive_calls, calls, total_time, cumulative_time, _) in rows
+    ]
+    return stats.total_tt, functions
@@ -0,0 +1,209 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import BigIntegerField, Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from bill_rate_system.models import DailyRevenue, MonthlyRevenue, Timesheet
+
+REVENUE_BATCH_SIZE = 500
+REPORT_GROUPS = {'project': 'project__name', 'employee': 'employee_id', 'month': 'month'}
+
+
+def _as_date(value):
+    return Timesheet._meta.get_field('date').to_python(value)
+
+
+def daily_deltas(timesheets, sign=1):
+    """
+    Return the change ``timesheets`` make to the daily revenue.
+
+    Keys are ``(project_id, employee_id, date)`` and values are
+    ``(rows, minutes, rate_cent_minutes)``. Use ``sign=-1`` for rows being
+    removed or for the state of a row before it is edited.
+    """
+    deltas = {}
+    for timesheet in timesheets:
+        key = (int(timesheet.project_id), int(timesheet.employee_id), _as_date(timesheet.date))
+        minutes = int(timesheet.duration_minutes)
+        rows, total_minutes, cent_minutes = deltas.get(key, (0, 0, 0))
+        deltas[key] = (
+            rows + sign,
+            total_minutes + sign * minutes,
+            cent_minutes + sign * int(timesheet.rate_cents) * minutes,
+        )
+    return deltas
+
+
+def monthly_deltas(*delta_maps):
+    """Fold daily delta maps into one map keyed by ``(project_id, employee_id, month)``."""
+    deltas = {}
+    for daily in delta_maps:
+        for (project_id, employee_id, day), change in daily.items():
+            key = (project_id, employee_id, day.replace(day=1))
+            deltas[key] = tuple(map(sum, zip(deltas.get(key, (0, 0, 0)), change)))
+    return deltas
+
+
+def _apply(model, period, delta_maps):
+    keys = {key for deltas in delta_maps for key in deltas}
+    if not keys:
+        return
+
+    periods = [key[2] for key in keys]
+    existing = {
+        (revenue.project_id, revenue.employee_id, getattr(revenue, period)): revenue
+        for revenue in model.objects.select_for_update().filter(**{
+            'project_id__in': {key[0] for key in keys},
+            'employee_id__in': {key[1] for key in keys},
+            f'{period}__range': (min(periods), max(periods)),
+        })
+    }
+    changed = {}
+    for deltas in delta_maps:
+        for key, (rows, minutes, cent_minutes) in deltas.items():
+            revenue = changed.get(key) or existing.get(key)
+            if revenue is None:
+                revenue = model(project_id=key[0], employee_id=key[1], **{period: key[2]})
+            revenue.row_count += rows
+            revenue.total_minutes += minutes
+            revenue.rate_cent_minutes += cent_minutes
+            changed[key] = revenue
+
+    # Deleted and inserted again, like the invoice aggregates.
+    stored = [revenue.pk for revenue in changed.values() if revenue.pk]
+    for start in range(0, len(stored), REVENUE_BATCH_SIZE):
+        model.objects.filter(pk__in=stored[start:start + REVENUE_BATCH_SIZE]).delete()
+    remaining = []
+    for revenue in changed.values():
+        if revenue.row_count > 0:
+            revenue.pk = None
+            remaining.append(revenue)
+    model.objects.bulk_create(remaining, batch_size=REVENUE_BATCH_SIZE)
+
+
+def apply_daily_deltas(*delta_maps):
+    """Add each delta map to the stored daily and monthly revenue, creating and removing rows as needed."""
+    with transaction.atomic():
+        _apply(DailyRevenue, 'date', delta_maps)
+        _apply(MonthlyRevenue, 'month', [monthly_deltas(*delta_maps)])
+
+
+def daily_totals(timesheets):
+    """Group ``timesheets`` per project, employee and day in the database."""
+    return timesheets.values('project_id', 'employee_id', 'date').annotate(
+        row_count=Count('id'),
+        total_minutes=Sum('duration_minutes'),
+        rate_cent_minutes=Sum(F('rate_cents') * F('duration_minutes'), output_field=BigIntegerField()),
+    ).order_by()
+
+
+def _month_end(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def rebuild_daily_revenue(start, end):
+    """
+    Recompute the daily revenue of every day from ``start`` to ``end`` from the timesheets.
+
+    The monthly revenue of every month the range touches is then summed
+    again from the days.
+    """
+    first, last = start.replace(day=1), _month_end(end)
+    with transaction.atomic():
+        DailyRevenue.objects.filter(date__range=(start, end)).delete()
+        DailyRevenue.objects.bulk_create(
+            [DailyRevenue(**row) for row in daily_totals(Timesheet.objects.filter(date__range=(start, end)))],
+            batch_size=REVENUE_BATCH_SIZE,
+        )
+        MonthlyRevenue.objects.filter(month__range=(first, last)).delete()
+        months = DailyRevenue.objects.filter(date__range=(first, last)).annotate(month=TruncMonth('date'))
+        MonthlyRevenue.objects.bulk_create(
+            [MonthlyRevenue(**row) for row in months.values('project_id', 'employee_id', 'month').annotate(
+                row_count=Sum('row_count'),
+                total_minutes=Sum('total_minutes'),
+                rate_cent_minutes=Sum('rate_cent_minutes'),
+            ).order_by()],
+            batch_size=REVENUE_BATCH_SIZE,
+        )
+
+
+def _cost(cent_minutes):
+    return (Decimal(cent_minutes) / 6000).quantize(Decimal('0.01'))
+
+
+def _report_groups(revenue, fields, sums):
+    if fields:
+        return revenue.values(*fields).annotate(**sums).order_by()
+    return [revenue.aggregate(**sums)]
+
+
+def revenue_report(start, end, group_by=(), project=None, employee_id=None):
+    """
+    Sum the revenue from ``start`` to ``end``, both included, per group.
+
+    ``group_by`` holds any of ``'project'``, ``'employee'`` and ``'month'``.
+    Whole months are read from MonthlyRevenue and the days before the first
+    and after the last whole month from DailyRevenue, so a year costs about
+    twelve rows per project and employee. Returns one line per group,
+    ordered by the group keys, and the totals of the whole range. Each line
+    has the group keys and its rows, hours and cost.
+    """
+    first_month = start if start.day == 1 else _month_end(start) + timedelta(days=1)
+    after_months = (end + timedelta(days=1)).replace(day=1)
+    if first_month < after_months:
+        months = MonthlyRevenue.objects.filter(month__gte=first_month, month__lt=after_months)
+        days = DailyRevenue.objects.filter(Q(date__gte=start, date__lt=first_month) | Q(date__gte=after_months, date__lte=end))
+    else:
+        months = MonthlyRevenue.objects.none()
+        days = DailyRevenue.objects.filter(date__range=(start, end))
+    if 'month' in group_by:
+        days = days.annotate(month=TruncMonth('date'))
+
+    sums = {
+        'row_count': Sum('row_count'),
+        'total_minutes': Sum('total_minutes'),
+        'rate_cent_minutes': Sum('rate_cent_minutes'),
+    }
+    fields = [REPORT_GROUPS[key] for key in group_by]
+    merged = {}
+    for revenue in (months, days):
+        if project is not None:
+            revenue = revenue.filter(project__name=project)
+        if employee_id is not None:
+            revenue = revenue.filter(employee_id=employee_id)
+        for group in _report_groups(revenue, fields, sums):
+            if not group['row_count']:
+                continue
+            key = tuple(group[field] for field in fields)
+            rows, minutes, cent_minutes = merged.get(key, (0, 0, 0))
+            merged[key] = (
+                rows + group['row_count'],
+                minutes + group['total_minutes'],
+                cent_minutes + group['rate_cent_minutes'],
+            )
+
+    lines = []
+    totals = {'rows': 0, 'minutes': 0, 'cent_minutes': 0}
+    for key in sorted(merged):
+        rows, minutes, cent_minutes = merged[key]
+        group = dict(zip(fields, key))
+        line = {}
+        if 'project' in group_by:
+            line['project'] = group['project__name']
+        if 'employee' in group_by:
+            line['employee_id'] = group['employee_id']
+        if 'month' in group_by:
+            line['month'] = group['month'].strftime('%Y-%m')
+        line.update(rows=rows, hours=round(minutes / 60, 2), cost=_cost(cent_minutes))
+        lines.append(line)
+        totals['rows'] += rows
+        totals['minutes'] += minutes
+        totals['cent_minutes'] += cent_minutes
+
+    return lines, {
+        'rows': totals['rows'],
+        'hours': round(totals['minutes'] / 60, 2),
+        'cost': _cost(totals['cent_minutes']),
+    }
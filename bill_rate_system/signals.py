@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from bill_rate_system.cache import invalidate_projects
+from bill_rate_system.models import Project
+
+
+@receiver([post_save, post_delete], sender=Project)
+def project_changed(sender, **kwargs):
+    # Invalidate again on commit so a reload that raced the open transaction
+    # does not keep the old names.
+    invalidate_projects()
+    transaction.on_commit(invalidate_projects)
@@ -0,0 +1,202 @@
+import glob
+import hashlib
+import io
+import os
+import re
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from bill_rate_system.validation import (
+    MAX_VALIDATION_ERRORS, REQUIRED_COLUMNS, normalize_project_names, parse_frame, validate_frame,
+)
+
+UPLOAD_DIR = "uploads"
+PARSED_DIR = os.path.join(UPLOAD_DIR, "parsed")
+READ_BLOCK_SIZE = 1024 * 1024
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+def new_upload_id():
+    return uuid.uuid4().hex
+
+
+class TeeReader(io.RawIOBase):
+    """Binary reader over ``source`` that writes every byte it reads to ``sink``."""
+
+    def __init__(self, source, sink):
+        super().__init__()
+        self.source = source
+        self.sink = sink
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.source.read(len(buffer))
+        self.sink.write(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+    def copy_remaining(self):
+        """Copy whatever the consumer did not read, so ``sink`` holds the whole source."""
+        while self.read(READ_BLOCK_SIZE):
+            pass
+
+
+def parsed_dir(upload_id):
+    if not _UPLOAD_ID.match(upload_id or ''):
+        raise ValueError(f"Invalid upload id: {upload_id!r}")
+    return os.path.join(PARSED_DIR, upload_id)
+
+
+def has_parsed(upload_id):
+    try:
+        return os.path.isdir(parsed_dir(upload_id))
+    except ValueError:
+        return False
+
+
+def save_parsed_chunk(upload_id, position, typed):
+    """
+    Store one validated chunk from ``parse_frame`` as compact typed columns.
+
+    Projects are stored as codes into a table of names. Dates are stored as
+    days and times as minutes since midnight, so loading needs no parsing.
+    """
+    directory = parsed_dir(upload_id)
+    os.makedirs(directory, exist_ok=True)
+    codes, names = pd.factorize(typed['project'])
+    np.savez(
+        os.path.join(directory, f"part-{position:05d}.npz"),
+        row_index=typed.index.to_numpy(np.int64),
+        employee_id=typed['employee_id'].to_numpy(np.int64),
+        billable_rate=typed['billable_rate'].to_numpy(np.float64),
+        project_codes=codes.astype(np.int32),
+        project_names=np.asarray(names, dtype=str),
+        date=typed['date'].to_numpy('datetime64[D]'),
+        start_minutes=typed['start_minutes'].to_numpy(np.int16),
+        end_minutes=typed['end_minutes'].to_numpy(np.int16),
+    )
+
+
+def validate_upload(chunks, upload_id, find_projects):
+    """
+    Validate raw CSV ``chunks`` one at a time, storing each clean parsed chunk under ``upload_id``.
+
+    ``find_projects`` maps a set of project names to the registered ones.
+    Checking stops at the first chunk with an error, whose message is
+    returned for the response. Returns None when the whole file is valid.
+    """
+    has_data = False
+    for position, df in enumerate(chunks):
+        if position == 0:
+            columns = list(df.columns)
+            extra_columns = [col for col in columns if col not in REQUIRED_COLUMNS]
+
+            if len(columns) > len(REQUIRED_COLUMNS):
+                return f"Unexpected extra columns detected: {', '.join(extra_columns)}"
+
+            for column in REQUIRED_COLUMNS:
+                if column not in columns:
+                    return f" Missing required column: {column}"
+
+        project_names = set(normalize_project_names(df['Project']).dropna())
+        missing_projects = project_names - set(find_projects(project_names))
+
+        if missing_projects:
+            return f"Invalid file: These projects/companies are not registered to the system {list(missing_projects)}, Please check for Project Spelling Errors or Add Project to the system"
+
+        typed = parse_frame(df)
+        validation_errors = validate_frame(df, typed, limit=MAX_VALIDATION_ERRORS)
+        if validation_errors:
+            return validation_errors
+
+        missing_data_errors = []
+        for column in REQUIRED_COLUMNS:
+            missing_rows = df.index[df[column].isna()].tolist()
+            if missing_rows:
+                missing_data_errors.append(f"Missing data in column '{column}' at rows: {', '.join(map(str, missing_rows))}")
+
+        if missing_data_errors:
+            return " | ".join(missing_data_errors)
+
+        has_data = has_data or not df.empty
+        save_parsed_chunk(upload_id, position, typed)
+
+    if not has_data:
+        return "The uploaded file contains no data after the headers."
+    return None
+
+
+def validate_saved_file(path, upload_id, registered_projects, chunksize):
+    """
+    Validate the CSV at ``path`` with ``validate_upload``, for use in a worker process.
+
+    The registered project names are passed in because the worker does not
+    use the database. Parsed chunks of a rejected file are removed.
+    """
+    def find_projects(names):
+        return {name: registered_projects[name] for name in names if name in registered_projects}
+
+    try:
+        error = validate_upload(pd.read_csv(path, chunksize=chunksize), upload_id, find_projects)
+    except Exception as e:
+        error = f"File processing error: {str(e)}"
+    if error is not None:
+        discard_parsed(upload_id)
+    return error
+
+
+def load_parsed_chunks(upload_id):
+    """Yield the stored chunks of ``upload_id`` in file order, in the shape ``parse_frame`` returns."""
+    for path in sorted(glob.glob(os.path.join(parsed_dir(upload_id), "part-*.npz"))):
+        with np.load(path) as columns:
+            yield pd.DataFrame({
+                'employee_id': columns['employee_id'].astype(np.int64),
+                'billable_rate': columns['billable_rate'],
+                'project': columns['project_names'].astype(object)[columns['project_codes']],
+                'date': columns['date'].astype('datetime64[ns]'),
+                'start_minutes': columns['start_minutes'].astype(np.float64),
+                'end_minutes': columns['end_minutes'].astype(np.float64),
+            }, index=columns['row_index'])
+
+
+def discard_parsed(upload_id):
+    shutil.rmtree(parsed_dir(upload_id), ignore_errors=True)
+
+
+def fingerprint(path, prefix_sizes=()):
+    """
+    Hash the file at ``path`` and, in the same read, each of its first ``n`` bytes for ``n`` in ``prefix_sizes``.
+
+    Returns ``(digest, size, prefixes)`` where ``prefixes`` maps every prefix
+    size shorter than the file to the SHA-256 of that prefix.
+    """
+    digest = hashlib.sha256()
+    offsets = sorted(n for n in set(prefix_sizes) if n > 0)
+    prefixes = {}
+    size = 0
+    with open(path, 'rb') as f:
+        while True:
+            # Stop each read at the next prefix size so its digest can be taken there.
+            limit = min(READ_BLOCK_SIZE, offsets[0] - size) if offsets else READ_BLOCK_SIZE
+            block = f.read(limit)
+            if not block:
+                break
+            digest.update(block)
+            size += len(block)
+            if offsets and size == offsets[0]:
+                prefixes[offsets.pop(0)] = digest.hexdigest()
+    return digest.hexdigest(), size, prefixes
+
+
+def is_line_boundary(path, offset):
+    """True when the first ``offset`` bytes of ``path`` end with a complete line."""
+    with open(path, 'rb') as f:
+        f.seek(offset - 1)
+        around = f.read(2)
+    return around[:1] == b'\n' or around[1:2] in (b'\n', b'\r')
@@ -1,20 +1,31 @@
 from django.urls import path
-from .views import upload_page,edit_timesheet,invoice_details,invoice_db_list,upload_temp_file,process_file ,list_projects,view_invoice,project_list,project_add,project_edit,timesheets,timesheet_detail,edit_timesheet_name
+from .views import upload_page,edit_timesheet,bulk_edit,invoice_details,invoice_db_list,upload_temp_file,process_file ,list_projects,view_invoice,project_list,project_add,project_edit,timesheets,timesheet_detail,edit_timesheet_name,job_status,timesheet_rows,export_timesheets,export_invoice,revenue_report_page,revenue_report_data,upload_batch,profile_list,profile_detail
 
 app_name="bill_rate_system"
 urlpatterns = [
     path("", upload_page, name="upload-page"),
     path('upload_temp_file/', upload_temp_file, name='upload_temp_file'), 
     path('process_file/', process_file, name='process_file'),
+    path('upload_batch/', upload_batch, name='upload_batch'),
+    path('jobs/<int:job_id>/', job_status, name='job_status'),
     path('list_projects/', list_projects, name='list_projects'),
     path('projects/', project_list, name='project_list'),
     path('projects/add/',project_add, name='project_add'),
     path('projects/edit/<int:id>/',project_edit, name='project_edit'),
     path('timesheets/', timesheets, name='timesheets'),
+    path('timesheets/bulk_edit/', bulk_edit, name='bulk_edit'),
     path('timesheets/<str:sheet_name>/', timesheet_detail, name='timesheet_detail'),
-    path('timesheet/edit/<int:timesheet_id>/', edit_timesheet_name, name='edit_timesheet_name'),
+    path('timesheets/<str:sheet_name>/rows/', timesheet_rows, name='timesheet_rows'),
+    path('timesheet/edit/<int:sheet_id>/', edit_timesheet_name, name='edit_timesheet_name'),
     path('view_invoice/<str:project_name>/', view_invoice, name='view_invoice'),
     path('invoices/<str:sheet_name>/', invoice_db_list, name='invoice_list'),
     path("timesheets/edit/<int:timesheet_id>/", edit_timesheet, name="edit_timesheet"),
     path('invoice_details/<str:sheet_name>/<str:project_name>/', invoice_details, name='invoice_details'),
+    path('exports/timesheets/', export_timesheets, name='export_timesheets'),
+    path('exports/timesheets/<str:sheet_name>/', export_timesheets, name='export_sheet'),
+    path('exports/invoices/<str:sheet_name>/', export_invoice, name='export_invoice'),
+    path('reports/revenue/', revenue_report_page, name='revenue_report'),
+    path('reports/revenue/data/', revenue_report_data, name='revenue_report_data'),
+    path('profiles/', profile_list, name='profile_list'),
+    path('profiles/<str:name>/', profile_detail, name='profile_detail'),
 ]
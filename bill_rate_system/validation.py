@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+from bill_rate_system.metrics import stage
+
+REQUIRED_COLUMNS = ['Employee ID', 'Billable Rate', 'Project', 'Date', 'Start Time', 'End Time']
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%m-%d-%Y']
+TIME_FORMATS = ['%H:%M', '%I:%M %p']
+MAX_VALIDATION_ERRORS = 100
+
+
+def parse_with_formats(series, formats):
+    """
+    Parse ``series`` trying each format in turn, only on the values still unparsed.
+
+    Dates and times repeat heavily, so only the distinct values are parsed and
+    the results are mapped back onto the rows.
+    """
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Series(uniques, dtype=object)
+    parsed = pd.to_datetime(uniques, format=formats[0], errors='coerce')
+    for fmt in formats[1:]:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(uniques[missing], format=fmt, errors='coerce')
+    # factorize marks missing values with -1, which picks the trailing NaT.
+    values = np.append(parsed.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))
+    return pd.Series(values[codes], index=series.index)
+
+
+def time_minutes(series):
+    """Minutes since midnight of each time string, NaN where it does not parse."""
+    times = parse_with_formats(series.astype(str), TIME_FORMATS)
+    return times.dt.hour * 60 + times.dt.minute
+
+
+def duration_minutes(start_minutes, end_minutes):
+    """
+    Billable minutes of a shift from its start and end in minutes since midnight.
+
+    Takes numbers or Series. A shift must end after it starts on the same
+    day; otherwise the result is None, or NaN in a Series, so the row is
+    reported or skipped instead of billed.
+    """
+    duration = end_minutes - start_minutes
+    if isinstance(duration, pd.Series):
+        return duration.where(duration > 0)
+    return duration if duration > 0 else None
+
+
+def normalize_project_names(projects):
+    """Strip and title-case project names, leaving missing values missing."""
+    return projects.where(projects.isna(), projects.astype(str).str.strip().str.title())
+
+
+def parse_frame(df):
+    """
+    Convert the raw CSV columns of ``df`` to typed columns.
+
+    Values that do not parse become NaN/NaT; ``validate_frame`` reports them.
+    This is the only place uploaded dates and times are parsed.
+    """
+    with stage('parse'):
+        return pd.DataFrame({
+            'employee_id': pd.to_numeric(df['Employee ID'], errors='coerce'),
+            'billable_rate': pd.to_numeric(df['Billable Rate'], errors='coerce'),
+            'project': df['Project'],
+            'date': parse_with_formats(df['Date'].astype(str), DATE_FORMATS),
+            'start_minutes': time_minutes(df['Start Time']),
+            'end_minutes': time_minutes(df['End Time']),
+        }, index=df.index)
+
+
+def validate_frame(df, typed=None, limit=None):
+    """
+    Validate every row of ``df`` with one vectorized pass per column.
+
+    ``typed`` is the result of ``parse_frame(df)`` when the caller already has
+    it. Returns the error messages ordered by row, numbered from the frame's
+    index so chunks of a larger file report their position in the file. At
+    most ``limit`` messages are built when a limit is given.
+    """
+    if typed is None:
+        typed = parse_frame(df)
+
+    with stage('validate'):
+        return _frame_errors(df, typed, limit)
+
+
+def _frame_errors(df, typed, limit):
+    employee_ids = typed['employee_id']
+    invalid_employee = (employee_ids.isna() | (employee_ids <= 0) | (employee_ids % 1 != 0)).to_numpy()
+
+    rates = typed['billable_rate']
+    invalid_rate = ((rates.isna() & df['Billable Rate'].notna()) | (rates <= 0)).to_numpy()
+
+    invalid_date = typed['date'].isna().to_numpy()
+
+    invalid_start = typed['start_minutes'].isna().to_numpy()
+    invalid_end = typed['end_minutes'].isna().to_numpy()
+    start_minutes = typed['start_minutes'].to_numpy()
+    end_minutes = typed['end_minutes'].to_numpy()
+    with np.errstate(invalid='ignore'):
+        ends_before_start = ~invalid_start & ~invalid_end & (end_minutes <= start_minutes)
+
+    failing = np.flatnonzero(
+        invalid_employee | invalid_rate | invalid_date | invalid_start | invalid_end | ends_before_start
+    )
+
+    errors = []
+    index = df.index.to_numpy()
+    employee_values = df['Employee ID'].to_numpy()
+    rate_values = df['Billable Rate'].to_numpy()
+    for position in failing:
+        if limit is not None and len(errors) >= limit:
+            break
+        row = index[position] + 1
+        if invalid_employee[position]:
+            errors.append(f"Row {row}: Invalid Employee ID ({employee_values[position]}).")
+        if invalid_rate[position]:
+            errors.append(f"Row {row}: Invalid Billable Rate ({rate_values[position]}).")
+        if invalid_date[position]:
+            errors.append(f"Invalid Date format at row {row}. Accepted formats: YYYY-MM-DD, DD/MM/YYYY, MM-DD-YYYY.")
+        if invalid_start[position]:
+            errors.append(f"Invalid Start Time format at row {row}. Accepted formats: HH:MM (24-hour), HH:MM AM/PM.")
+        if invalid_end[position]:
+            errors.append(f"Invalid End Time format at row {row}. Accepted formats: HH:MM (24-hour), HH:MM AM/PM.")
+        if ends_before_start[position]:
+            errors.append(f"End Time must be after Start Time at row {row}.")
+    return errors[:limit] if limit is not None else errors
@@ -1,22 +1,44 @@
 from django.shortcuts import render
 from django.core.files.storage import default_storage
-import pandas as pd 
+import base64
+import binascii
 import json
 import os
 from datetime import datetime,date
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.core.paginator import Paginator
+from django.db.models import Count, F, Q, Sum
 from django.views.decorators.csrf import csrf_exempt
-from bill_rate_system.models import Timesheet,Project 
+from bill_rate_system.models import Timesheet,Project,IngestJob,InvoiceAggregate,Sheet
+from bill_rate_system.aggregates import apply_deltas, timesheet_deltas
+from bill_rate_system.ingest import InvoiceAccumulator, read_csv_chunks
+from bill_rate_system.batch import discard_batch_file, publish_batch_file, save_batch_files, validate_batch
+from bill_rate_system.bulk_edit import bulk_edit_timesheets, parse_changes, select_timesheets
+from bill_rate_system.jobs import enqueue, match_previous_upload, restore_invoice, wake_worker
+from bill_rate_system.metrics import render as render_metrics
+from bill_rate_system.profiling import list_profiles, profiled, top_functions
+from bill_rate_system.revenue import REPORT_GROUPS, apply_daily_deltas, daily_deltas, revenue_report
+from bill_rate_system.exports import export_invoice_csv, export_timesheets_csv
+from bill_rate_system.cache import invoice_key, load_invoice, project_ids
+from bill_rate_system.validation import parse_frame
+from bill_rate_system.uploads import UPLOAD_DIR, TeeReader, discard_parsed, has_parsed, new_upload_id, validate_upload
 import random
 import string
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404
 import logging
 logger = logging.getLogger('views_logger')
-from collections import defaultdict
-from decimal import Decimal
+
+TIMESHEETS_PER_PAGE = 25
+TIMESHEET_SORTS = {'uploaded_at': 'created_at', '-uploaded_at': '-created_at'}
+TIMESHEET_ROW_SORTS = {'employee_id': 'employee_id', 'project': 'project__name', 'date': 'date'}
+MAX_ROWS_PER_PAGE = 500
 
 
 
@@ -27,65 +49,8 @@ def upload_page(request):
 
 
 
-def validate_row(row, index, required_columns, actual_column_count):
-    errors = []
-    
-    if len(row) != actual_column_count:
-        errors.append(f"Row {index + 1}: Incorrect number of columns.")
-
-    try:
-        employee_id = float(row['Employee ID'])  
-        if employee_id <= 0 or not employee_id.is_integer():
-            errors.append(f"Row {index + 1}: Invalid Employee ID ({row['Employee ID']}).")
-    except ValueError:
-        errors.append(f"Row {index + 1}: Invalid Employee ID ({row['Employee ID']}).")
-        
-    try:
-        billable_rate = float(row['Billable Rate'])  
-        if billable_rate <= 0:
-            errors.append(f"Row {index + 1}: Invalid Billable Rate ({row['Billable Rate']}).")
-    except ValueError:
-        errors.append(f"Row {index + 1}: Invalid Billable Rate ({row['Billable Rate']}).")
-
-    date_formats = ['%Y-%m-%d', '%d/%m/%Y', '%m-%d-%Y']
-    time_formats = ['%H:%M', '%I:%M %p']
-
-    def parse_date(date_str):
-        for fmt in date_formats:
-            try:
-                return datetime.strptime(date_str, fmt)
-            except ValueError:
-                continue
-        return None 
-
-    def parse_time(time_str):
-        for fmt in time_formats:
-            try:
-                return datetime.strptime(time_str, fmt).time()
-            except ValueError:
-                continue
-        return None 
-
-    date = parse_date(str(row['Date']))
-    if date is None:
-        errors.append(f"Invalid Date format at row {index + 1}. Accepted formats: YYYY-MM-DD, DD/MM/YYYY, MM-DD-YYYY.")
-
-    start_time = parse_time(str(row['Start Time']))
-    end_time = parse_time(str(row['End Time']))
-
-    if start_time is None:
-        errors.append(f"Invalid Start Time format at row {index + 1}. Accepted formats: HH:MM (24-hour), HH:MM AM/PM.")
-    if end_time is None:
-        errors.append(f"Invalid End Time format at row {index + 1}. Accepted formats: HH:MM (24-hour), HH:MM AM/PM.")
-
-    if start_time and end_time and end_time <= start_time:
-        errors.append(f"End Time must be after Start Time at row {index + 1}.")
-
-    return errors
-
-
-
 @csrf_exempt
+@profiled
 def upload_temp_file(request):
     if request.method != "POST":
         return JsonResponse({"error": "Invalid request method"}, status=400)
@@ -98,74 +63,86 @@ def upload_temp_file(request):
     if not file.name.endswith('.csv'):
         return JsonResponse({"error": "Only CSV files are allowed!"}, status=400)
 
+    upload_id = new_upload_id()
+    partial_path = os.path.join(UPLOAD_DIR, f"{upload_id}.part")
+    accepted = False
     try:
-        df = pd.read_csv(file)
-        
-        project_names = set(df['Project'].str.strip().str.title())
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-        existing_projects = set(Project.objects.values_list('name', flat=True))
+        # The file is written to disk as the parser reads it, and reading stops
+        # at the first chunk with an error, so a bad file is rejected without
+        # reading the rest of it.
+        with open(partial_path, "wb") as destination:
+            reader = TeeReader(file, destination)
+            error = validate_upload(read_csv_chunks(reader), upload_id, project_ids)
+            if error is None:
+                reader.copy_remaining()
 
-        missing_projects = project_names - existing_projects
-        
-        if missing_projects:
-            return JsonResponse({"error": f"Invalid file: These projects/companies are not registered to the system {list(missing_projects)}, Please check for Project Spelling Errors or Add Project to the system"}, status=400)
-
-        required_columns = ['Employee ID', 'Billable Rate', 'Project', 'Date', 'Start Time', 'End Time']
-        extra_columns = [col for col in df.columns if col not in required_columns]
-
-        if len(df.columns) > len(required_columns):
-            return JsonResponse({
-                "error": f"Unexpected extra columns detected: {', '.join(extra_columns)}"
-            }, status=400)
-            
-        validation_errors = []
-        for index, row in df.head(10).iterrows():
-            errors = validate_row(row, index, required_columns, len(df.columns))
-            if errors:
-                validation_errors.extend(errors)
-
-        if validation_errors:
-            return JsonResponse({"error": validation_errors}, status=400)
-            
-        for column in required_columns:
-            if column not in df.columns:
-                return JsonResponse({"error": f" Missing required column: {column}"}, status=400)
-
-        if df[required_columns].isnull().all().all():
-            return JsonResponse({"error": "The uploaded file contains no data after the headers."}, status=400)
-
-        missing_data_errors = []
-        for column in required_columns:
-            missing_rows = df[df[column].isna()].index.tolist()
-            if missing_rows:
-                missing_data_errors.append(f"Missing data in column '{column}' at rows: {', '.join(map(str, missing_rows))}")
-
-        if missing_data_errors:
-            return JsonResponse({"error": " | ".join(missing_data_errors)}, status=400)
-
-        upload_dir = "uploads"
-        if not os.path.exists(upload_dir):
-            os.makedirs(upload_dir)
-
-        file_path = os.path.join(upload_dir, file.name)
-        with open(file_path, "wb+") as destination:
-            for chunk in file.chunks():
-                destination.write(chunk)
-
-        return JsonResponse({"message": "File uploaded successfully!", "file_name": file.name})
+        if error is not None:
+            return JsonResponse({"error": error}, status=400)
+
+        # Published under the upload id, so another upload with the same
+        # name cannot replace it before it is processed.
+        file_name = publish_batch_file(file.name, upload_id)
+
+        accepted = True
+        return JsonResponse({"message": "File uploaded successfully!", "file_name": file_name, "upload_id": upload_id})
 
     except Exception as e:
         return JsonResponse({"error": f"File processing error: {str(e)}"}, status=400)
 
+    finally:
+        if not accepted:
+            discard_parsed(upload_id)
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
 
 def generate_sheet_name():
     sheet_id = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))  
     return f"sheet{sheet_id}"
 
 
+def queue_ingest(file_name, upload_id="", uploaded_by=None):
+    """
+    Queue an IngestJob for an uploaded file into a new Sheet.
+
+    Returns ``(job, reused)``. When the same user already ingested the file's
+    content the earlier job is returned instead, with its invoice recomputed if it
+    has expired; when it extends an earlier upload
+    the new job skips the rows that upload already stored.
+    """
+    path = os.path.join(UPLOAD_DIR, file_name)
+    content_hash, content_size, same, base = match_previous_upload(path, uploaded_by)
+    if same is not None:
+        restore_invoice(same.id, path, upload_id)
+        if upload_id:
+            discard_parsed(upload_id)
+        logger.info(f"{file_name} has the same content as ingest job {same.id}, reusing its result.")
+        return same, True
+
+    while True:
+        try:
+            with transaction.atomic():
+                sheet = Sheet.objects.create(
+                    name=generate_sheet_name(), uploaded_by=uploaded_by, file_name=file_name, content_hash=content_hash)
+            break
+        except IntegrityError:
+            continue
+    logger.info(f"Generated sheet name: {sheet.name}")
+    skip_rows = base.skip_rows + base.rows_processed if base else 0
+    job = IngestJob.objects.create(
+        file_name=file_name, upload_id=upload_id, sheet=sheet, uploaded_by=uploaded_by,
+        content_hash=content_hash, content_size=content_size, skip_rows=skip_rows)
+    enqueue(job)
+    if base:
+        logger.info(f"{file_name} extends ingest job {base.id}, skipping its first {skip_rows} rows.")
+    logger.info(f"Queued ingest job {job.id} for {file_name}.")
+    return job, False
 
 
 @csrf_exempt
+@profiled
 def process_file(request):
     try:
         logger.info("Processing file request received.")
@@ -182,98 +159,124 @@ def process_file(request):
             return JsonResponse({"error": "Invalid JSON data"}, status=400)
 
         file_name = data.get("file_name")
-        sheet_name = generate_sheet_name()
-        logger.info(f"Generated sheet name: {sheet_name}")
 
         if not file_name:
             logger.warning("No file name provided in request.")
             return JsonResponse({"error": "No file name provided"}, status=400)
 
-        file_path = os.path.join("uploads", file_name)
+        file_path = os.path.join(UPLOAD_DIR, file_name)
         if not os.path.exists(file_path):
             logger.error(f"File not found at path: {file_path}")
             return JsonResponse({"error": "File not found!"}, status=400)
 
-        df = pd.read_csv(file_path)
-        logger.info("CSV file loaded successfully.")
-
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce').dt.strftime('%Y-%m-%d')
+        upload_id = data.get("upload_id") if has_parsed(data.get("upload_id")) else ""
+        job, reused = queue_ingest(file_name, upload_id, request.user if request.user.is_authenticated else None)
 
-        new_entries = []
-        for _, row in df.iterrows():
-            try:
-                project = Project.objects.get(name=row['Project'].strip().title())
-
-                exists = Timesheet.objects.filter(
-                    employee_id=row['Employee ID'],
-                    project=project,
-                    date=row['Date'],
-                    start_time=row['Start Time'],
-                    end_time=row['End Time']
-                ).exists()
-
-                if not exists:
-                    new_entry = Timesheet(
-                        employee_id=row['Employee ID'],
-                        billable_rate=row['Billable Rate'],
-                        project=project,
-                        date=row['Date'],
-                        start_time=row['Start Time'],
-                        end_time=row['End Time'],
-                        sheet_name=sheet_name  
-                    )
-                    new_entries.append(new_entry)
-                    logger.info(f"New entry added for Employee ID: {row['Employee ID']} on {row['Date']}.")
-
-            except Exception as row_error:
-                logger.error(f"Error processing row {row.to_dict()}: {row_error}", exc_info=True)
-
-        if new_entries:
-            Timesheet.objects.bulk_create(new_entries)
-            logger.info(f"{len(new_entries)} new entries successfully added to the database.")
-
-        invoice_data = generate_invoice(df)
-        request.session["invoice_data"] = invoice_data
-        request.session.modified = True  
-
-        sheet_name_message = f"The sheet name is {sheet_name}. You can change it later."
-        response_data = {
-            "message": "File processed successfully!",
-            "sheet_name": sheet_name_message if new_entries else "",
-            "redirect_url": "/revenue_collection/list_projects/"
-        }
-        logger.info("File processing completed successfully.")
-        return JsonResponse(response_data)
+        return JsonResponse({
+            "message": "This file has already been processed." if reused else "File accepted for processing.",
+            "job_id": job.id,
+            "status_url": reverse("bill_rate_system:job_status", args=[job.id])
+        })
 
     except Exception as e:
         logger.critical(f"Unexpected processing error: {str(e)}", exc_info=True)
         return JsonResponse({"error": f"Processing error: {str(e)}"}, status=400)
 
 
+@csrf_exempt
+def upload_batch(request):
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=400)
+
+    files = request.FILES.getlist("files")
+    if not files:
+        return JsonResponse({"error": "No files provided"}, status=400)
+
+    saved = []
+    try:
+        saved, rejected = save_batch_files(files)
+        report = [{"file_name": name, "status": "rejected", "error": error} for name, error in rejected]
+
+        # Files are parsed and validated in parallel; ingestion then goes
+        # through the job queue, which serializes the inserts.
+        for (name, upload_id), error in zip(saved, validate_batch([upload_id for _, upload_id in saved])):
+            if error is not None:
+                discard_batch_file(upload_id)
+                report.append({"file_name": name, "status": "rejected", "error": error})
+                continue
+            file_name = publish_batch_file(name, upload_id)
+            job, reused = queue_ingest(file_name, upload_id, request.user if request.user.is_authenticated else None)
+            job.refresh_from_db()
+            report.append({
+                "file_name": name,
+                "status": "already processed" if reused else "accepted",
+                "job_id": job.id,
+                "job_status": job.status,
+                "rows_inserted": job.rows_inserted,
+                "status_url": reverse("bill_rate_system:job_status", args=[job.id]),
+            })
+
+        accepted = sum(1 for entry in report if entry["status"] != "rejected")
+        logger.info(f"Batch upload of {len(report)} files: {accepted} accepted, {len(report) - accepted} rejected.")
+        return JsonResponse({
+            "message": f"{accepted} of {len(report)} files accepted for processing.",
+            "accepted": accepted,
+            "rejected": len(report) - accepted,
+            "files": report,
+        })
+
+    except Exception as e:
+        logger.critical(f"Unexpected batch upload error: {str(e)}", exc_info=True)
+        return JsonResponse({"error": f"Batch processing error: {str(e)}"}, status=400)
+
+    finally:
+        # Files that were neither published nor rejected yet, after an error.
+        for _, upload_id in saved:
+            discard_batch_file(upload_id)
+
+
+@login_required(login_url='authentication:login')
+def job_status(request, job_id):
+    # A job, and the invoice key it puts in the session, is only shown to
+    # the user who uploaded its file, or to staff.
+    jobs = IngestJob.objects.select_related('sheet')
+    if not request.user.is_staff:
+        jobs = jobs.filter(uploaded_by=request.user)
+    job = get_object_or_404(jobs, id=job_id)
+    if job.status in (IngestJob.PENDING, IngestJob.RUNNING) and not settings.INGEST_JOBS_EAGER:
+        # Jobs left behind by a restarted process are picked up once polled.
+        wake_worker()
+    response_data = {
+        "job_id": job.id,
+        "status": job.status,
+        "rows_processed": job.rows_processed,
+        "rows_skipped": job.skip_rows,
+        "rows_inserted": job.rows_inserted,
+        "duplicates": job.duplicates,
+        "errors": job.errors,
+    }
+
+    if job.status == IngestJob.DONE:
+        request.session["invoice_key"] = invoice_key(job.id)
+        sheet_name_message = f"The sheet name is {job.sheet.name}. You can change it later." if job.sheet else ""
+        response_data.update({
+            "error_rows": job.error_report,
+            "message": "File processed successfully!",
+            "sheet_name": sheet_name_message if job.rows_inserted else "",
+            "redirect_url": "/revenue_collection/list_projects/"
+        })
+    elif job.status == IngestJob.FAILED:
+        response_data["error"] = f"Processing error: {job.error}"
+
+    return JsonResponse(response_data)
+
+
 def generate_invoice(df):
     try:
         logger.info("Starting invoice generation process.")
-        df['Start Time'] = pd.to_datetime(df['Start Time'], format='%H:%M', errors='coerce').dt.time
-        df['End Time'] = pd.to_datetime(df['End Time'], format='%H:%M', errors='coerce').dt.time
-        df = df.dropna(subset=['Start Time', 'End Time'])
-        logger.info("Converted time fields successfully.")
-        
-        df['Hours Worked'] = df.apply(
-            lambda row: (datetime.combine(datetime.min, row['End Time']) - 
-                         datetime.combine(datetime.min, row['Start Time'])).seconds / 3600, axis=1)
-        df['Cost'] = df['Hours Worked'] * df['Billable Rate']
-        logger.info("Calculated billable hours and cost.")
-
-        grouped = df.groupby(['Project', 'Employee ID']).agg(
-            Total_Hours=('Hours Worked', 'sum'),
-            Unit_Price=('Billable Rate', 'first'),
-            Total_Cost=('Cost', 'sum')
-        ).reset_index()
-
-        invoice_data = {}
-        for project, project_data in grouped.groupby('Project'):
-            invoice_data[project] = project_data.to_dict(orient='records')
-
+        accumulator = InvoiceAccumulator()
+        accumulator.add(parse_frame(df))
+        invoice_data = accumulator.invoice_data()
         logger.info("Invoice data successfully generated.")
         return invoice_data  
 
@@ -286,10 +289,10 @@ def generate_invoice(df):
 @login_required(login_url='authentication:login')
 def list_projects(request):
     logger.info(f"User {request.user} accessed the project list page.")
-    invoice_data = request.session.get("invoice_data", {})
+    invoice_data = load_invoice(request.session.get("invoice_key"))
     
     if not invoice_data:
-        logger.warning("No invoice data found in session for user %s.", request.user)
+        logger.warning("No invoice data found in cache for user %s.", request.user)
         return render(request, "bill_rate_system/view_invoice.html", {"invoice": "No invoice data found"})
     projects = list(invoice_data.keys())
     
@@ -301,10 +304,10 @@ def list_projects(request):
 @login_required(login_url='authentication:login')
 def view_invoice(request, project_name):
     logger.info(f"User {request.user} accessed invoice for project: {project_name}")
-    invoice_data = request.session.get("invoice_data", {})
+    invoice_data = load_invoice(request.session.get("invoice_key"))
 
     if not invoice_data:
-        logger.warning(f"No invoice data found in session for user {request.user}.")
+        logger.warning(f"No invoice data found in cache for user {request.user}.")
         return render(request, "bill_rate_system/view_invoice.html", {
             "invoice": "No invoice data found",
             "error": "No invoice data found"
@@ -344,37 +347,144 @@ def project_list(request):
 @login_required(login_url='authentication:login')
 def timesheets(request):
     logger.info(f"User {request.user} accessed the timesheets page.")
-    sheet_names = Timesheet.objects.values('sheet_name').distinct()
-    timesheet_data = {sheet['sheet_name']: Timesheet.objects.filter(sheet_name=sheet['sheet_name']) for sheet in sheet_names}
-    logger.info(f"Retrieved {len(timesheet_data)} distinct timesheets.")
-    return render(request, 'bill_rate_system/timesheets.html', {'timesheet_data': timesheet_data})
+    sort = request.GET.get("sort", "-uploaded_at")
+    if sort not in TIMESHEET_SORTS:
+        sort = "-uploaded_at"
+
+    # Sheets and their per-employee aggregates are small tables; the
+    # timesheet rows themselves are not read.
+    sheets = Sheet.objects.select_related('uploaded_by').annotate(
+        project_count=Count('aggregates__project', distinct=True),
+        total_minutes=Sum('aggregates__total_minutes'),
+    ).order_by(TIMESHEET_SORTS[sort], 'name')
+
+    page = Paginator(sheets, TIMESHEETS_PER_PAGE).get_page(request.GET.get("page"))
+    for sheet in page:
+        sheet.total_hours = round((sheet.total_minutes or 0) / 60, 2)
+    logger.info(f"Retrieved page {page.number} of {page.paginator.num_pages} of timesheets.")
+    return render(request, 'bill_rate_system/timesheets.html', {'page': page, 'sort': sort})
 
 @login_required(login_url='authentication:login')
-def edit_timesheet_name(request, timesheet_id):
-    timesheet = get_object_or_404(Timesheet, id=timesheet_id)
-    timesheets = Timesheet.objects.filter(sheet_name=timesheet.sheet_name)
-    logger.info(f"User {request.user} accessed timesheet edit page for ID {timesheet_id}.")
+def edit_timesheet_name(request, sheet_id):
+    sheet = get_object_or_404(Sheet, id=sheet_id)
+    logger.info(f"User {request.user} accessed sheet edit page for ID {sheet_id}.")
 
     if request.method == "POST":
         new_name = request.POST.get("sheet_name")
         if new_name:
-            timesheets.update(sheet_name=new_name)
-            logger.info(f"Updated timesheet name from {timesheet.sheet_name} to {new_name}.")
+            old_name = sheet.name
+            sheet.name = new_name
+            try:
+                with transaction.atomic():
+                    sheet.save(update_fields=["name"])
+            except IntegrityError:
+                sheet.name = old_name
+                logger.warning(f"User {request.user} attempted to rename sheet {old_name} to the existing name {new_name}.")
+                messages.error(request, "A timesheet with this name already exists. Please choose a different name.")
+                return render(request, "bill_rate_system/edit_timesheet_name.html", {"sheet": sheet})
+            logger.info(f"Updated timesheet name from {old_name} to {new_name}.")
             messages.success(request, "All timesheets with this name have been updated successfully!")
-            return render(request, "bill_rate_system/edit_timesheet_name.html", {"timesheet": timesheet})  
+            return render(request, "bill_rate_system/edit_timesheet_name.html", {"sheet": sheet})  
         else:
             logger.warning(f"User {request.user} attempted to rename a timesheet but provided an empty name.")
             messages.error(request, "Timesheet name cannot be empty.")
 
-    return render(request, "bill_rate_system/edit_timesheet_name.html", {"timesheet": timesheet})
+    return render(request, "bill_rate_system/edit_timesheet_name.html", {"sheet": sheet})
 
 
 @login_required(login_url='authentication:login')
 def timesheet_detail(request, sheet_name):
     logger.info(f"User {request.user} accessed timesheet details for sheet name {sheet_name}.")
-    timesheets = Timesheet.objects.filter(sheet_name=sheet_name)
-    logger.info(f"Retrieved {timesheets.count()} entries for sheet name {sheet_name}.")
-    return render(request, 'bill_rate_system/timesheet_detail.html', {'timesheets': timesheets, "sheet_name": sheet_name})
+    return render(request, 'bill_rate_system/timesheet_detail.html', {"sheet_name": sheet_name})
+
+
+def encode_cursor(value, pk):
+    return base64.urlsafe_b64encode(json.dumps([value, pk]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return value, int(pk)
+
+
+@login_required(login_url='authentication:login')
+def timesheet_rows(request, sheet_name):
+    """
+    Return one page of a sheet's rows as JSON, filtered and sorted in the database.
+
+    Pages are addressed by an opaque ``cursor`` (keyset pagination on the sort
+    column and id); ``offset`` is only used when no cursor is known. The
+    response carries the DataTables server-side fields.
+    """
+    sort = request.GET.get("sort", "date")
+    if sort not in TIMESHEET_ROW_SORTS:
+        return JsonResponse({"error": f"Cannot sort by {sort}"}, status=400)
+    sort_field = TIMESHEET_ROW_SORTS[sort]
+    descending = request.GET.get("dir") == "desc"
+
+    try:
+        limit = min(max(int(request.GET.get("length", 50)), 1), MAX_ROWS_PER_PAGE)
+        offset = max(int(request.GET.get("offset", 0)), 0)
+        cursor = decode_cursor(request.GET["cursor"]) if request.GET.get("cursor") else None
+    except (ValueError, TypeError, binascii.Error):
+        return JsonResponse({"error": "Invalid paging parameters"}, status=400)
+
+    sheet_rows = Timesheet.objects.filter(sheet__name=sheet_name)
+    rows = sheet_rows
+    if request.GET.get("employee", "").isdigit():
+        rows = rows.filter(employee_id=int(request.GET["employee"]))
+    if request.GET.get("project"):
+        rows = rows.filter(project__name__icontains=request.GET["project"])
+    try:
+        if request.GET.get("date_from"):
+            rows = rows.filter(date__gte=date.fromisoformat(request.GET["date_from"]))
+        if request.GET.get("date_to"):
+            rows = rows.filter(date__lte=date.fromisoformat(request.GET["date_to"]))
+    except ValueError:
+        return JsonResponse({"error": "Dates must be given as YYYY-MM-DD."}, status=400)
+    search = request.GET.get("search", "").strip()
+    if search.isdigit():
+        rows = rows.filter(employee_id=int(search))
+    elif search:
+        rows = rows.filter(project__name__icontains=search)
+
+    page = rows.select_related('project')
+    if cursor is not None:
+        value, pk = cursor
+        after = "lt" if descending else "gt"
+        page = page.filter(Q(**{f"{sort_field}__{after}": value}) | Q(**{sort_field: value, f"id__{after}": pk}))
+        offset = 0
+    ordering = [f"-{sort_field}", "-id"] if descending else [sort_field, "id"]
+    page = list(page.order_by(*ordering)[offset:offset + limit + 1])
+
+    has_more = len(page) > limit
+    page = page[:limit]
+    next_cursor = None
+    if has_more:
+        last = page[-1]
+        last_value = {"employee_id": last.employee_id, "project": last.project.name, "date": last.date.isoformat()}[sort]
+        next_cursor = encode_cursor(last_value, last.id)
+
+    return JsonResponse({
+        "draw": int(request.GET.get("draw", 0) or 0),
+        "recordsTotal": sheet_rows.count(),
+        "recordsFiltered": rows.count(),
+        "next_cursor": next_cursor,
+        "data": [
+            {
+                "id": timesheet.id,
+                "employee_id": timesheet.employee_id,
+                "billable_rate": str(timesheet.billable_rate),
+                "project": timesheet.project.name,
+                "date": timesheet.date.isoformat(),
+                "start_time": timesheet.start_time.strftime("%H:%M"),
+                "end_time": timesheet.end_time.strftime("%H:%M"),
+                "created_at": timesheet.created_at.isoformat(),
+                "edit_url": reverse("bill_rate_system:edit_timesheet", args=[timesheet.id]),
+            }
+            for timesheet in page
+        ],
+    })
 
 
 @login_required(login_url='authentication:login')
@@ -418,7 +528,9 @@ def invoice_db_list(request, sheet_name):
     logger.info(f"Fetching invoice list for sheet_name: {sheet_name}")
 
     try:
-        projects = Timesheet.objects.filter(sheet_name=sheet_name).values('project__name', 'sheet_name').distinct()
+        projects = InvoiceAggregate.objects.filter(sheet__name=sheet_name).values(
+            'project__name', sheet_name=F('sheet__name')
+        ).distinct()
         logger.debug(f"Retrieved projects: {list(projects)}")
     except Exception as e:
         logger.error(f"Error fetching invoice list: {e}", exc_info=True)
@@ -429,28 +541,18 @@ def invoice_db_list(request, sheet_name):
 
 
 @login_required(login_url='authentication:login')
+@profiled
 def invoice_details(request, sheet_name, project_name):
     logger.info(f"Fetching invoice details for sheet: {sheet_name}, project: {project_name}")
 
     try:
-        timesheets = Timesheet.objects.filter(sheet_name=sheet_name, project__name=project_name)
-        logger.debug(f"Retrieved timesheets: {list(timesheets)}")
-        
-        invoices = defaultdict(lambda: {"hours_worked": 0, "unit_price": 0, "cost": 0})
-
-        for timesheet in timesheets:
-            hours_worked = (datetime.combine(date.min, timesheet.end_time) - 
-                            datetime.combine(date.min, timesheet.start_time)).total_seconds() / 3600
-
-            employee_id = timesheet.employee_id
-
-            invoices[employee_id]["hours_worked"] += round(hours_worked, 2)
-            invoices[employee_id]["unit_price"] = timesheet.billable_rate
-            invoices[employee_id]["cost"] += Decimal(hours_worked) * timesheet.billable_rate
+        aggregates = InvoiceAggregate.objects.filter(
+            sheet__name=sheet_name, project__name=project_name
+        ).order_by('employee_id')
 
         invoice_list = [
-            {"employee_id": emp_id, "hours_worked": data["hours_worked"], "unit_price": data["unit_price"], "cost": data["cost"]}
-            for emp_id, data in invoices.items()
+            {"employee_id": aggregate.employee_id, "hours_worked": aggregate.hours_worked, "unit_price": aggregate.billable_rate, "cost": aggregate.cost}
+            for aggregate in aggregates
         ]
         
         total_cost = sum(item["cost"] for item in invoice_list)
@@ -469,6 +571,31 @@ def invoice_details(request, sheet_name, project_name):
     })
 
 
+@login_required(login_url='authentication:login')
+def export_timesheets(request, sheet_name=None):
+    timesheets = Timesheet.objects.all()
+    if sheet_name is not None:
+        timesheets = timesheets.filter(sheet__name=sheet_name)
+
+    try:
+        if request.GET.get("start"):
+            timesheets = timesheets.filter(date__gte=date.fromisoformat(request.GET["start"]))
+        if request.GET.get("end"):
+            timesheets = timesheets.filter(date__lte=date.fromisoformat(request.GET["end"]))
+    except ValueError:
+        return JsonResponse({"error": "Dates must be given as YYYY-MM-DD."}, status=400)
+
+    logger.info(f"User {request.user} exported timesheets for {sheet_name or 'all sheets'}.")
+    return export_timesheets_csv(timesheets, f"{sheet_name or 'timesheets'}.csv")
+
+
+@login_required(login_url='authentication:login')
+def export_invoice(request, sheet_name):
+    get_object_or_404(Sheet, name=sheet_name)
+    logger.info(f"User {request.user} exported the invoice for {sheet_name}.")
+    return export_invoice_csv(sheet_name, f"invoice_{sheet_name}.csv")
+
+
 @login_required(login_url='authentication:login')
 def edit_timesheet(request, timesheet_id):
     logger.info(f"Editing timesheet with ID: {timesheet_id}")
@@ -479,6 +606,8 @@ def edit_timesheet(request, timesheet_id):
     if request.method == "POST":
         try:
             logger.debug(f"Received POST data: {request.POST}")
+            previous = timesheet_deltas([timesheet], sign=-1)
+            previous_daily = daily_deltas([timesheet], sign=-1)
 
             timesheet.billable_rate = request.POST.get("billable_rate", timesheet.billable_rate)
             timesheet.date = request.POST.get("date", timesheet.date)
@@ -491,7 +620,10 @@ def edit_timesheet(request, timesheet_id):
 
             timesheet.project_id = request.POST.get("project", timesheet.project.id)
 
-            timesheet.save()
+            with transaction.atomic():
+                timesheet.save()
+                apply_deltas(previous, timesheet_deltas([timesheet]))
+                apply_daily_deltas(previous_daily, daily_deltas([timesheet]))
             logger.info(f"Timesheet {timesheet_id} updated successfully.")
 
             messages.success(request, "Timesheet updated successfully!")
@@ -505,3 +637,129 @@ def edit_timesheet(request, timesheet_id):
         "timesheet": timesheet,
         "projects": projects  
     })
+
+
+@login_required(login_url='authentication:login')
+def bulk_edit(request):
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=400)
+
+    try:
+        payload = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+
+    timesheets, filter_errors = select_timesheets(payload.get("filters"))
+    values, change_errors = parse_changes(payload.get("changes"))
+    if filter_errors or change_errors:
+        return JsonResponse({"error": filter_errors + change_errors}, status=400)
+
+    try:
+        updated, errors = bulk_edit_timesheets(timesheets, values)
+    except IntegrityError:
+        logger.warning(f"User {request.user} attempted a bulk edit that would duplicate existing timesheets.")
+        return JsonResponse({"error": "The changes would duplicate timesheets that already exist."}, status=409)
+    if errors:
+        return JsonResponse({"error": errors}, status=400)
+
+    logger.info(f"User {request.user} bulk edited {updated} timesheets ({', '.join(sorted(values))}).")
+    return JsonResponse({"message": f"{updated} timesheets updated successfully!", "updated": updated})
+
+
+def revenue_params(request):
+    """
+    Read the date range, grouping and filters of a revenue report from the query string.
+
+    Defaults to the current year to date, grouped by project and month.
+    Returns the keyword arguments for ``revenue_report`` and an error message.
+    """
+    today = date.today()
+    try:
+        start = date.fromisoformat(request.GET["start"]) if request.GET.get("start") else today.replace(month=1, day=1)
+        end = date.fromisoformat(request.GET["end"]) if request.GET.get("end") else today
+    except ValueError:
+        return None, "Dates must be given as YYYY-MM-DD."
+    if start > end:
+        return None, "The start date must not be after the end date."
+
+    group_by = [key for value in request.GET.getlist("group_by") for key in value.split(",") if key]
+    unknown = [key for key in group_by if key not in REPORT_GROUPS]
+    if unknown:
+        return None, f"Cannot group by {', '.join(unknown)}. Use {', '.join(REPORT_GROUPS)}."
+
+    employee = request.GET.get("employee", "")
+    if employee and not employee.isdigit():
+        return None, "Employee must be an Employee ID."
+
+    return {
+        "start": start,
+        "end": end,
+        "group_by": list(dict.fromkeys(group_by)) or ["project", "month"],
+        "project": request.GET.get("project") or None,
+        "employee_id": int(employee) if employee else None,
+    }, None
+
+
+@login_required(login_url='authentication:login')
+def revenue_report_page(request):
+    params, error = revenue_params(request)
+    if error:
+        messages.error(request, error)
+        lines, totals = [], None
+    else:
+        lines, totals = revenue_report(**params)
+        logger.info(f"User {request.user} viewed revenue from {params['start']} to {params['end']} by {params['group_by']}.")
+
+    return render(request, 'bill_rate_system/revenue_report.html', {
+        'params': params,
+        'groups': list(REPORT_GROUPS),
+        'lines': lines,
+        'totals': totals,
+        'query': request.GET.urlencode(),
+    })
+
+
+@login_required(login_url='authentication:login')
+def revenue_report_data(request):
+    params, error = revenue_params(request)
+    if error:
+        return JsonResponse({"error": error}, status=400)
+
+    lines, totals = revenue_report(**params)
+    logger.info(f"User {request.user} fetched revenue from {params['start']} to {params['end']} by {params['group_by']}.")
+    return JsonResponse({
+        "start": params["start"].isoformat(),
+        "end": params["end"].isoformat(),
+        "group_by": params["group_by"],
+        "rows": lines,
+        "totals": totals,
+    })
+
+
+def metrics(request):
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+        logger.warning(f"Refused metrics request from {request.META.get('REMOTE_ADDR')}.")
+        return HttpResponse(status=403)
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@staff_member_required
+def profile_list(request):
+    return render(request, 'bill_rate_system/profile_list.html', {'profiles': list_profiles()})
+
+
+@staff_member_required
+def profile_detail(request, name):
+    sort = request.GET.get("sort", "cumulative")
+    try:
+        total_time, functions = top_functions(name, sort)
+    except FileNotFoundError:
+        raise Http404("Profile not found")
+    return render(request, 'bill_rate_system/profile_detail.html', {
+        'name': name,
+        'sort': sort,
+        'total_time': total_time,
+        'functions': functions,
+    })
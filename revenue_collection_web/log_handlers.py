@@ -0,0 +1,53 @@
+import atexit
+import copy
+import logging
+import queue
+from logging.handlers import QueueListener
+
+
+class QueueFileHandler(logging.Handler):
+    """
+    Log to ``filename`` from a background thread.
+
+    Records are formatted by the logging thread and put on an in-memory
+    queue; a QueueListener writes them to the file, so logging calls never
+    wait on the disk. Pending records are written at interpreter exit.
+
+    This is a plain Handler that owns its queue and listener rather than a
+    QueueHandler subclass: dictConfig configures QueueHandler subclasses
+    itself on Python 3.12+ and would not accept ``filename``.
+    """
+
+    def __init__(self, filename, mode='a', encoding=None):
+        super().__init__()
+        self.queue = queue.SimpleQueue()
+        self.target = logging.FileHandler(filename, mode=mode, encoding=encoding, delay=True)
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def prepare(self, record):
+        # Same as QueueHandler.prepare: the queued copy carries the formatted
+        # text only, so the listener writes it as is.
+        message = self.format(record)
+        record = copy.copy(record)
+        record.message = message
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        record.stack_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            self.target.close()
+        super().close()
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'bill_rate_system.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -154,13 +155,15 @@ if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
 
+# Log lines are queued and written to views.log by a background thread, so
+# requests and ingest jobs never block on the log file.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'handlers': {
     'file': {
         'level': 'INFO',
-        'class': 'logging.FileHandler',
+        'class': 'revenue_collection_web.log_handlers.QueueFileHandler',
         'filename': os.path.join(LOG_DIR, 'views.log'),  # Ensure full path
         'formatter': 'verbose',
     },
@@ -188,6 +191,45 @@ LOGGING = {
 
 SESSION_ENGINE = "django.contrib.sessions.backends.db"
 
+# Invoice results are kept out of the session: the session only stores the
+# cache key. Old results expire after INVOICE_CACHE_TIMEOUT seconds and the
+# oldest are culled once MAX_ENTRIES is reached.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "invoices": {
+        "BACKEND": config("INVOICE_CACHE_BACKEND", default="django.core.cache.backends.filebased.FileBasedCache"),
+        "LOCATION": config("INVOICE_CACHE_LOCATION", default=str(BASE_DIR / "cache" / "invoices")),
+        "TIMEOUT": config("INVOICE_CACHE_TIMEOUT", default=60 * 60 * 24, cast=int),
+        "OPTIONS": {
+            "MAX_ENTRIES": config("INVOICE_CACHE_MAX_ENTRIES", default=500, cast=int),
+        },
+    },
+}
+
+# Uploaded files are ingested by a local thread pool fed from the IngestJob table.
+# Set INGEST_JOBS_EAGER to run jobs inside the request instead (used by the tests).
+INGEST_WORKERS = config("INGEST_WORKERS", default=2, cast=int)
+INGEST_JOBS_EAGER = config("INGEST_JOBS_EAGER", default=False, cast=bool)
+# Running jobs with no progress for this many seconds are treated as left
+# behind by a stopped process and queued again.
+INGEST_JOB_TIMEOUT = config("INGEST_JOB_TIMEOUT", default=30 * 60, cast=int)
+
+# Per-view and pipeline stage histograms are served in Prometheus format on
+# /metrics, only to these client addresses.
+METRICS_ALLOWED_IPS = config("METRICS_ALLOWED_IPS", default="127.0.0.1,::1", cast=lambda v: [ip.strip() for ip in v.split(",")])
+
+# Sampled profiling of the upload, ingest and invoice paths. When enabled, this
+# share of calls is run under cProfile; staff can also profile a single request
+# by sending the X-Profile header. Profiles are listed on /revenue_collection/profiles/.
+PROFILING_ENABLED = config("PROFILING_ENABLED", default=False, cast=bool)
+PROFILING_SAMPLE_RATE = config("PROFILING_SAMPLE_RATE", default=0.01, cast=float)
+PROFILE_DIR = config("PROFILE_DIR", default=str(BASE_DIR / "profiles"))
+
+# Files sent together to upload_batch are validated in parallel by this many processes.
+BATCH_WORKERS = config("BATCH_WORKERS", default=os.cpu_count() or 1, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
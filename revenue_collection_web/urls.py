@@ -18,11 +18,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from bill_rate_system.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include("authentication.urls")),
     path('revenue_collection/', include("bill_rate_system.urls")),
+    path('metrics', metrics, name='metrics'),
     
 ]
 
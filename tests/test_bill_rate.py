@@ -1,15 +1,29 @@
 import pytest
 from django.contrib.auth.models import User
 from django.urls import reverse
+import io
 import os
 import json
 import pandas as pd
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth.models import User
-from bill_rate_system.models import Project, Timesheet
+from bill_rate_system.models import Project, Sheet, Timesheet
 from django.contrib.messages import get_messages
+from django.core.management import call_command
 from datetime import date, time
 from decimal import Decimal
+from bill_rate_system.cache import store_invoice
+from bill_rate_system.validation import parse_frame
+from bill_rate_system.uploads import discard_parsed
+
+
+def get_sheet(name):
+    return Sheet.objects.get_or_create(name=name)[0]
+
+
+def store_test_invoice(invoice_data):
+    store_invoice("invoice:test", invoice_data)
+    return "invoice:test"
 
 
 @pytest.mark.django_db
@@ -32,6 +46,10 @@ def test_upload_temp_file_valid_csv(client):
     print("Response JSON:", response.json())  
     assert response.status_code == 200
     assert response.json()["message"] == "File uploaded successfully!"
+    # Published under the upload id, so same-named uploads never replace each other.
+    assert response.json()["file_name"] == f"{response.json()['upload_id']}_test.csv"
+    discard_parsed(response.json()["upload_id"])
+    os.remove(os.path.join("uploads", response.json()["file_name"]))
 
     
 @pytest.mark.django_db
@@ -62,7 +80,11 @@ def test_upload_temp_file_unregistered_project(client):
 
 
 @pytest.mark.django_db
-def test_process_file(client):
+def test_process_file(client, settings):
+    from django.test import Client
+
+    settings.INGEST_JOBS_EAGER = True
+    client.force_login(User.objects.create_user(username="testuser", password="testpass"))
     project = Project.objects.create(name="Test Project")
     file_path = "uploads/test.csv"
     df = pd.DataFrame([{
@@ -76,11 +98,69 @@ def test_process_file(client):
     df.to_csv(file_path, index=False)
     response = client.post(reverse('bill_rate_system:process_file'), json.dumps({"file_name": "test.csv"}), content_type="application/json")
     assert response.status_code == 200
+    assert "job_id" in response.json()
+
+    response = client.get(response.json()["status_url"])
+    assert response.json()["status"] == "done"
     assert "File processed successfully!" in response.json()["message"]
+    assert response.json()["rows_inserted"] == 1
     assert Timesheet.objects.count() == 1
+    assert "invoice_data" not in client.session
+    assert client.session["invoice_key"] == f"invoice:job:{response.json()['job_id']}"
+
+    # Only the uploader, or staff, can read the job and get its invoice key.
+    status_url = reverse("bill_rate_system:job_status", args=[response.json()["job_id"]])
+    other = Client()
+    assert other.get(status_url).status_code == 302
+    other.force_login(User.objects.create_user(username="other", password="testpass"))
+    assert other.get(status_url).status_code == 404
+    assert "invoice_key" not in other.session
+    other.force_login(User.objects.create_user(username="admin", password="testpass", is_staff=True))
+    assert other.get(status_url).json()["status"] == "done"
 
     os.remove(file_path)
 
+@pytest.mark.django_db
+def test_failed_job_does_not_leave_an_empty_sheet(client, settings, monkeypatch):
+    from bill_rate_system import jobs
+    from bill_rate_system.models import IngestJob
+
+    def fail(*args, **kwargs):
+        raise ValueError("Unreadable file")
+
+    settings.INGEST_JOBS_EAGER = True
+    client.force_login(User.objects.create_user(username="testuser", password="testpass"))
+    monkeypatch.setattr(jobs, "ingest_file", fail)
+    file_path = "uploads/test_failed.csv"
+    with open(file_path, "w") as f:
+        f.write("Employee ID,Billable Rate,Project,Date,Start Time,End Time\n")
+    try:
+        response = client.post(reverse('bill_rate_system:process_file'), json.dumps({"file_name": "test_failed.csv"}), content_type="application/json")
+    finally:
+        os.remove(file_path)
+
+    status = client.get(response.json()["status_url"]).json()
+    assert status["status"] == "failed" and "Unreadable file" in status["error"]
+    assert IngestJob.objects.get(pk=status["job_id"]).sheet is None
+    assert not Sheet.objects.exists()
+
+    # A job that finished without inserting a row does not keep its sheet either.
+    monkeypatch.undo()
+    file_path = "uploads/test_no_rows.csv"
+    with open(file_path, "w") as f:
+        f.write("Employee ID,Billable Rate,Project,Date,Start Time,End Time\n1,50,Unknown,2024-02-14,09:00,17:00\n")
+    try:
+        response = client.post(reverse('bill_rate_system:process_file'), json.dumps({"file_name": "test_no_rows.csv"}), content_type="application/json")
+    finally:
+        os.remove(file_path)
+
+    status = client.get(response.json()["status_url"]).json()
+    assert (status["status"], status["rows_inserted"], status["errors"]) == ("done", 0, 1)
+    assert status["sheet_name"] == ""
+    assert IngestJob.objects.get(pk=status["job_id"]).sheet is None
+    assert not Sheet.objects.exists()
+
+
 @pytest.mark.django_db
 def test_process_file_missing_file(client):
     response = client.post(reverse('bill_rate_system:process_file'), json.dumps({"file_name": "nonexistent.csv"}), content_type="application/json")
@@ -94,9 +174,9 @@ def test_list_projects_with_data(client):
     user = User.objects.create_user(username="testuser", password="testpass")
     client.force_login(user) 
     session = client.session
-    session["invoice_data"] = {
+    session["invoice_key"] = store_test_invoice({
         "Test Project": [{"Employee ID": 123, "Total_Hours": 8, "Total_Cost": 400}]
-    }
+    })
     session.save()
     response = client.get(reverse('bill_rate_system:list_projects'))
     print("Response Status Code:", response.status_code)
@@ -109,11 +189,11 @@ def test_view_invoice_authenticated(client):
     user = User.objects.create_user(username="testuser", password="testpass")
     client.force_login(user)
     session = client.session
-    session["invoice_data"] = {
+    session["invoice_key"] = store_test_invoice({
         "Test Project": [
             {"Employee ID": 123, "Total_Hours": 8, "Unit_Price": 50, "Total_Cost": 400}
         ]
-    }
+    })
     session.save()
 
     response = client.get(reverse("bill_rate_system:view_invoice", args=["Test Project"]))
@@ -136,7 +216,7 @@ def test_view_invoice_project_not_found(client):
     user = User.objects.create_user(username="testuser", password="testpass")
     client.force_login(user)
     session = client.session
-    session["invoice_data"] = {"Another Project": [{"Employee ID": 456, "Total_Hours": 5, "Total_Cost": 250}]}
+    session["invoice_key"] = store_test_invoice({"Another Project": [{"Employee ID": 456, "Total_Hours": 5, "Total_Cost": 250}]})
     session.save()
 
     response = client.get(reverse("bill_rate_system:view_invoice", args=["Test Project"]))
@@ -172,7 +252,7 @@ def test_timesheets_view(client):
         start_time=time(9, 0),
         end_time=time(17, 0),
         billable_rate=100.0,
-        sheet_name="Sheet1",
+        sheet=get_sheet("Sheet1"),
     )
     Timesheet.objects.create(
         employee_id=2,
@@ -181,7 +261,7 @@ def test_timesheets_view(client):
         start_time=time(10, 0),
         end_time=time(18, 0),
         billable_rate=120.0,
-        sheet_name="Sheet2",
+        sheet=get_sheet("Sheet2"),
     )
     Timesheet.objects.create(
         employee_id=3,
@@ -190,7 +270,7 @@ def test_timesheets_view(client):
         start_time=time(8, 0),
         end_time=time(16, 0),
         billable_rate=90.0,
-        sheet_name="Sheet1",
+        sheet=get_sheet("Sheet1"),
     )
     response = client.get(reverse("bill_rate_system:timesheets"))
     assert response.status_code == 200
@@ -211,16 +291,16 @@ def test_edit_timesheet_name(client):
         start_time=time(8, 0),
         end_time=time(16, 0),
         billable_rate=90.0,
-        sheet_name="Sheet1",
+        sheet=get_sheet("Sheet1"),
     )
 
     response = client.post(
-        reverse("bill_rate_system:edit_timesheet_name", args=[timesheet.id]),
+        reverse("bill_rate_system:edit_timesheet_name", args=[timesheet.sheet_id]),
         {"sheet_name": "New Name"},
     )
 
-    timesheet.refresh_from_db()
-    assert timesheet.sheet_name == "New Name"
+    assert Sheet.objects.get(pk=timesheet.sheet_id).name == "New Name"
+    assert Timesheet.objects.get(pk=timesheet.id).sheet.name == "New Name"
 
     messages = [m.message for m in get_messages(response.wsgi_request)]
     assert "All timesheets with this name have been updated successfully!" in messages
@@ -238,12 +318,14 @@ def test_timesheet_detail_view(client):
         start_time=time(8, 0),
         end_time=time(16, 0),
         billable_rate=90.0,
-        sheet_name="Sheet1",
+        sheet=get_sheet("Sheet1"),
     )
     response = client.get(reverse("bill_rate_system:timesheet_detail", args=["Sheet1"]))
 
     assert response.status_code == 200
     assert "Sheet1" in response.content.decode()
+    # Rows are drawn client side from JSON, with every cell HTML-escaped.
+    assert "$.fn.dataTable.render.text()" in response.content.decode()
 
 
 
@@ -280,3 +362,1037 @@ def test_project_edit(client):
 
 
  
+
+
+@pytest.mark.django_db
+def test_insert_timesheets_skips_duplicates(django_assert_max_num_queries):
+    from bill_rate_system.ingest import insert_timesheets
+
+    project = Project.objects.create(name="Test Project")
+    Timesheet.objects.create(
+        employee_id=1,
+        project=project,
+        date=date(2024, 2, 14),
+        start_time=time(9, 0),
+        end_time=time(17, 0),
+        billable_rate=50,
+        sheet=get_sheet("Sheet1"),
+    )
+    df = pd.DataFrame({
+        "Employee ID": [1, 2, 2, 3, 4],
+        "Billable Rate": [50, 60, 60, 70, 80],
+        "Project": ["Test Project", "test project ", "Test Project", "Unknown", "Test Project"],
+        "Date": ["2024-02-14"] * 5,
+        "Start Time": ["09:00", "09:00", "09:00", "09:00", "10:00"],
+        "End Time": ["17:00", "17:00", "17:00", "17:00", "12:00"],
+    })
+
+    # Aggregates, daily and monthly revenue are updated once per frame, whatever the number of batches.
+    with django_assert_max_num_queries(2 + 2 * 9 + 7):
+        inserted, duplicates, errors = insert_timesheets(parse_frame(df), get_sheet("Sheet2"), batch_size=2)
+
+    assert (inserted, duplicates, errors) == (2, 2, 1)
+    assert Timesheet.objects.filter(sheet__name="Sheet2").count() == 2
+
+
+@pytest.mark.django_db
+def test_insert_timesheets_commits_rows_and_aggregates_together(monkeypatch):
+    from django.db.models import Sum
+    from bill_rate_system.ingest import insert_timesheets
+    from bill_rate_system.models import DailyRevenue, InvoiceAggregate, MonthlyRevenue
+
+    Project.objects.create(name="Alpha")
+    sheet = get_sheet("Sheet1")
+
+    def frame(employee_ids):
+        return parse_frame(pd.DataFrame({
+            "Employee ID": employee_ids,
+            "Billable Rate": [50] * len(employee_ids),
+            "Project": ["Alpha"] * len(employee_ids),
+            "Date": ["2024-02-14"] * len(employee_ids),
+            "Start Time": ["09:00"] * len(employee_ids),
+            "End Time": ["10:00"] * len(employee_ids),
+        }))
+
+    insert_timesheets(frame([1, 2]), sheet)
+
+    # The second batch fails after the first one was inserted.
+    bulk_create = Timesheet.objects.bulk_create
+    calls = []
+
+    def failing_bulk_create(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("database is locked")
+        return bulk_create(*args, **kwargs)
+
+    monkeypatch.setattr(Timesheet.objects, "bulk_create", failing_bulk_create)
+    with pytest.raises(RuntimeError):
+        insert_timesheets(frame([1, 3, 4, 5]), sheet, batch_size=2)
+
+    assert Timesheet.objects.count() == 2
+    assert InvoiceAggregate.objects.aggregate(rows=Sum("row_count"))["rows"] == 2
+    assert Sheet.objects.get(pk=sheet.pk).row_count == 2
+
+    # Writing the rollups, the last step, fails too.
+    monkeypatch.setattr(Timesheet.objects, "bulk_create", bulk_create)
+
+    def failing_rollup(*args, **kwargs):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(MonthlyRevenue.objects, "bulk_create", failing_rollup)
+    with pytest.raises(RuntimeError):
+        insert_timesheets(frame([3, 4]), sheet, batch_size=1)
+
+    assert Timesheet.objects.count() == 2
+    stored = Timesheet.objects.aggregate(minutes=Sum("duration_minutes"))["minutes"]
+    for rollup in (DailyRevenue, MonthlyRevenue):
+        sums = rollup.objects.aggregate(rows=Sum("row_count"), minutes=Sum("total_minutes"))
+        assert (sums["rows"], sums["minutes"]) == (2, stored)
+
+
+@pytest.mark.django_db
+def test_insert_timesheets_rejects_shifts_ending_before_they_start():
+    from bill_rate_system.ingest import insert_timesheets
+    from bill_rate_system.models import InvoiceAggregate
+
+    Project.objects.create(name="Test Project")
+    typed = parse_frame(pd.DataFrame({
+        "Employee ID": [1, 2, 3],
+        "Billable Rate": [40, 50, 60],
+        "Project": ["Test Project"] * 3,
+        "Date": ["2024-02-14"] * 3,
+        "Start Time": ["22:00", "09:00", "09:00"],
+        "End Time": ["02:00", "09:00", "17:00"],
+    }))
+    error_rows = []
+
+    inserted, duplicates, errors = insert_timesheets(typed, get_sheet("Sheet1"), error_rows=error_rows)
+
+    assert (inserted, duplicates, errors) == (1, 0, 2)
+    assert [error['reason'] for error in error_rows] == ['end time not after start time'] * 2
+    assert list(Timesheet.objects.values_list("employee_id", "duration_minutes")) == [(3, 480)]
+    assert list(InvoiceAggregate.objects.values_list("employee_id", "total_minutes")) == [(3, 480)]
+
+    with pytest.raises(ValueError):
+        Timesheet(
+            employee_id=4, billable_rate=40, project=Project.objects.get(), date="2024-02-14",
+            start_time="22:00", end_time="02:00", sheet=get_sheet("Sheet1"),
+        ).save()
+
+
+@pytest.mark.django_db
+def test_ingest_reports_skipped_rows_and_logs_once_per_chunk(caplog, monkeypatch):
+    import logging
+    from bill_rate_system.ingest import ingest_chunks
+    from revenue_collection_web.log_handlers import QueueFileHandler
+
+    Project.objects.create(name="Test Project")
+    df = pd.DataFrame({
+        "Employee ID": [1, 2, 3, 4],
+        "Billable Rate": [50, 60, 70, 80],
+        "Project": ["Test Project", "Unknown", "Test Project", "Unknown"],
+        "Date": ["2024-02-14", "2024-02-14", "not a date", "2024-02-15"],
+        "Start Time": ["09:00"] * 4,
+        "End Time": ["17:00"] * 4,
+    })
+    typed = parse_frame(df)
+    error_rows = []
+    monkeypatch.setattr(logging.getLogger('views_logger'), 'propagate', True)
+
+    with caplog.at_level(logging.INFO, logger='views_logger'):
+        counts, _ = ingest_chunks([typed.iloc[:2], typed.iloc[2:]], get_sheet("Sheet1"), error_rows=error_rows)
+
+    assert counts['errors'] == 3
+    assert sorted(error_rows, key=lambda error: error['row']) == [
+        {'row': 2, 'employee_id': 2, 'project': 'Unknown', 'reason': 'unknown project'},
+        {'row': 3, 'employee_id': 3, 'project': 'Test Project',
+         'reason': 'invalid employee ID, rate, date or time'},
+        {'row': 4, 'employee_id': 4, 'project': 'Unknown', 'reason': 'unknown project'},
+    ]
+    assert [record.message for record in caplog.records] == [
+        "Chunk 1 of Sheet1: 2 rows, 1 inserted, 0 duplicates, 1 errors.",
+        "Chunk 2 of Sheet1: 2 rows, 0 inserted, 0 duplicates, 2 errors.",
+    ]
+    assert all(isinstance(handler, QueueFileHandler) for handler in logging.getLogger('views_logger').handlers)
+
+
+def test_logging_settings_configure_queued_file_handler(tmp_path, settings):
+    import copy
+    import logging
+    from logging.config import dictConfig
+
+    log_file = tmp_path / "views.log"
+    config = copy.deepcopy(settings.LOGGING)
+    config['handlers']['file']['filename'] = str(log_file)
+    try:
+        dictConfig(config)
+        logger = logging.getLogger('views_logger')
+        logger.info("Queued %s", "message")
+        logger.handlers[0].close()
+        assert log_file.read_text().endswith("Queued message\n")
+        assert log_file.read_text().startswith("INFO ")
+    finally:
+        dictConfig(settings.LOGGING)
+
+
+def test_invoice_accumulator_matches_single_pass():
+    from bill_rate_system.ingest import InvoiceAccumulator
+    from bill_rate_system.views import generate_invoice
+
+    df = pd.DataFrame({
+        "Employee ID": [1, 2, 1, 2, 1],
+        "Billable Rate": [50, 60, 55, 60, 50],
+        "Project": ["Alpha", "Alpha", "Alpha", "Beta", "Beta"],
+        "Date": ["2024-02-14"] * 5,
+        "Start Time": ["09:00", "09:00", "13:00", "08:30", "10:00"],
+        "End Time": ["12:00", "17:00", "14:30", "09:00", "11:15"],
+    })
+
+    accumulator = InvoiceAccumulator()
+    for start in range(0, len(df), 2):
+        accumulator.add(parse_frame(df.iloc[start:start + 2]))
+
+    assert accumulator.invoice_data() == generate_invoice(df.copy())
+    assert accumulator.invoice_data()["Alpha"][0] == {
+        "Project": "Alpha", "Employee ID": 1, "Total_Hours": 4.5, "Unit_Price": 50, "Total_Cost": 232.5
+    }
+
+
+def test_validate_frame_reports_every_row():
+    from bill_rate_system.validation import validate_frame
+
+    df = pd.DataFrame({
+        "Employee ID": [1, 2, -3, "x"],
+        "Billable Rate": [50, 0, 60, 70],
+        "Project": ["Alpha"] * 4,
+        "Date": ["2024-02-14", "14/02/2024", "2024/02/14", "02-14-2024"],
+        "Start Time": ["09:00", "9:00 AM", "10:00", "25:00"],
+        "End Time": ["17:00", "05:00 PM", "09:00", "11:00"],
+    }, index=range(20, 24))
+
+    assert validate_frame(df) == [
+        "Row 22: Invalid Billable Rate (0).",
+        "Row 23: Invalid Employee ID (-3).",
+        "Invalid Date format at row 23. Accepted formats: YYYY-MM-DD, DD/MM/YYYY, MM-DD-YYYY.",
+        "End Time must be after Start Time at row 23.",
+        "Row 24: Invalid Employee ID (x).",
+        "Invalid Start Time format at row 24. Accepted formats: HH:MM (24-hour), HH:MM AM/PM.",
+    ]
+    assert len(validate_frame(df, limit=2)) == 2
+
+
+@pytest.mark.django_db
+def test_upload_temp_file_rejects_bad_row_past_first_ten(client):
+    Project.objects.create(name="Test Project")
+    rows = "".join(f"{i},50,Test Project,2024-02-14,09:00,17:00\n" for i in range(1, 30))
+    csv_content = ("Employee ID,Billable Rate,Project,Date,Start Time,End Time\n" + rows + "30,50,Test Project,2024-02-14,17:00,09:00").encode()
+    csv_file = SimpleUploadedFile("test.csv", csv_content, content_type="text/csv")
+    response = client.post(reverse('bill_rate_system:upload_temp_file'), {'file': csv_file})
+    assert response.status_code == 400
+    assert response.json()["error"] == ["End Time must be after Start Time at row 30."]
+
+
+def test_add_billing_columns_uses_minutes_since_midnight():
+    from bill_rate_system.ingest import add_billing_columns
+
+    df = pd.DataFrame({
+        "Employee ID": [1, 2, 3],
+        "Billable Rate": [40, 60, 80],
+        "Project": ["Alpha"] * 3,
+        "Date": ["2024-02-14"] * 3,
+        "Start Time": ["09:15", "10:00 PM", "bad"],
+        "End Time": ["17:45", "02:30", "10:00"],
+    })
+    billed = add_billing_columns(parse_frame(df))
+
+    # A shift that ends before it starts is not billed, as at ingest.
+    assert billed["employee_id"].tolist() == [1]
+    assert billed["hours_worked"].tolist() == [8.5]
+    assert billed["cost"].tolist() == [340.0]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_process_file_runs_in_background(client):
+    import time as clock
+    from bill_rate_system.models import IngestJob
+
+    Project.objects.create(name="Test Project")
+    file_path = "uploads/test_background.csv"
+    pd.DataFrame([{
+        "Employee ID": 123,
+        "Billable Rate": 50,
+        "Project": "Test Project",
+        "Date": "2024-02-14",
+        "Start Time": "09:00",
+        "End Time": "17:00"
+    }]).to_csv(file_path, index=False)
+
+    try:
+        response = client.post(reverse('bill_rate_system:process_file'), json.dumps({"file_name": "test_background.csv"}), content_type="application/json")
+        job_id = response.json()["job_id"]
+        deadline = clock.monotonic() + 10
+        while IngestJob.objects.get(pk=job_id).status not in (IngestJob.DONE, IngestJob.FAILED) and clock.monotonic() < deadline:
+            clock.sleep(0.05)
+    finally:
+        os.remove(file_path)
+
+    job = IngestJob.objects.get(pk=job_id)
+    assert job.status == IngestJob.DONE
+    assert (job.rows_processed, job.rows_inserted, job.duplicates, job.errors) == (1, 1, 0, 0)
+    from bill_rate_system.cache import invoice_key, load_invoice
+    assert list(load_invoice(invoice_key(job_id))) == ["Test Project"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_worker_requeues_stale_running_jobs_and_claims_leftover_pending(client):
+    import time as clock
+    from datetime import timedelta
+    from django.utils import timezone
+    from bill_rate_system.jobs import claim_next_job
+    from bill_rate_system.models import IngestJob
+
+    Project.objects.create(name="Test Project")
+    file_path = "uploads/test_stale_job.csv"
+    pd.DataFrame([{
+        "Employee ID": 123, "Billable Rate": 50, "Project": "Test Project",
+        "Date": "2024-02-14", "Start Time": "09:00", "End Time": "17:00",
+    }]).to_csv(file_path, index=False)
+
+    client.force_login(User.objects.create_user(username="admin", password="testpass", is_staff=True))
+    # Left behind by a process that stopped: one job mid-run, one never claimed.
+    stale = IngestJob.objects.create(file_name="test_stale_job.csv", sheet=get_sheet("Stale"), status=IngestJob.RUNNING)
+    IngestJob.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+    pending = IngestJob.objects.create(file_name="test_stale_job.csv", sheet=get_sheet("Pending"))
+    running = IngestJob.objects.create(file_name="test_stale_job.csv", sheet=get_sheet("Running"), status=IngestJob.RUNNING)
+
+    try:
+        client.get(reverse("bill_rate_system:job_status", args=[stale.id]))
+        deadline = clock.monotonic() + 10
+        while (IngestJob.objects.filter(pk__in=[stale.pk, pending.pk], status=IngestJob.DONE).count() < 2
+               and clock.monotonic() < deadline):
+            clock.sleep(0.05)
+    finally:
+        os.remove(file_path)
+
+    jobs = IngestJob.objects.filter(pk__in=[stale.pk, pending.pk])
+    assert [job.status for job in jobs] == [IngestJob.DONE, IngestJob.DONE]
+    assert sorted(job.rows_inserted for job in jobs) == [0, 1]
+    assert Timesheet.objects.count() == 1
+    # A job that recorded progress recently is still running somewhere.
+    assert IngestJob.objects.get(pk=running.pk).status == IngestJob.RUNNING
+    assert claim_next_job() is None
+
+
+@pytest.mark.django_db
+def test_invoice_aggregates_follow_ingest_and_edits(client):
+    from bill_rate_system.ingest import insert_timesheets
+    from bill_rate_system.models import InvoiceAggregate
+
+    user = User.objects.create_user(username="testuser", password="testpass")
+    client.force_login(user)
+    alpha = Project.objects.create(name="Alpha")
+    beta = Project.objects.create(name="Beta")
+    df = pd.DataFrame({
+        "Employee ID": [1, 1, 2],
+        "Billable Rate": [30, 30, 45],
+        "Project": ["Alpha", "Alpha", "Alpha"],
+        "Date": ["2024-02-14", "2024-02-15", "2024-02-14"],
+        "Start Time": ["09:00", "09:00", "10:00"],
+        "End Time": ["09:20", "10:00", "12:30"],
+    })
+    insert_timesheets(parse_frame(df), get_sheet("Sheet1"))
+
+    response = client.get(reverse("bill_rate_system:invoice_details", args=["Sheet1", "Alpha"]))
+    assert [(i["employee_id"], i["hours_worked"], i["cost"]) for i in response.context["invoices"]] == [
+        (1, 1.33, Decimal("40.00")), (2, 2.5, Decimal("112.50"))
+    ]
+    assert response.context["total_cost"] == Decimal("152.50")
+
+    timesheet = Timesheet.objects.get(employee_id=2)
+    client.post(reverse("bill_rate_system:edit_timesheet", args=[timesheet.id]), {
+        "billable_rate": "50", "date": "2024-02-14", "start_time": "10:00", "end_time": "11:00", "project": beta.id,
+    })
+    assert not InvoiceAggregate.objects.filter(project=alpha, employee_id=2).exists()
+    moved = InvoiceAggregate.objects.get(project=beta, employee_id=2)
+    assert (moved.row_count, moved.total_minutes, moved.cost) == (1, 60, Decimal("50.00"))
+
+    client.post(reverse("bill_rate_system:edit_timesheet_name", args=[timesheet.sheet_id]), {"sheet_name": "Renamed"})
+    assert set(InvoiceAggregate.objects.values_list("sheet__name", flat=True)) == {"Renamed"}
+
+
+@pytest.mark.django_db
+def test_bulk_edit_updates_rows_in_batches_and_refreshes_aggregates(client, django_assert_max_num_queries):
+    from bill_rate_system.aggregates import rebuild_aggregates
+    from bill_rate_system.ingest import insert_timesheets
+    from bill_rate_system.models import InvoiceAggregate
+
+    user = User.objects.create_user(username="testuser", password="testpass")
+    client.force_login(user)
+    Project.objects.create(name="Alpha")
+    beta = Project.objects.create(name="Beta")
+    df = pd.DataFrame({
+        "Employee ID": [1, 1, 2, 3],
+        "Billable Rate": [30, 30, 45, 60],
+        "Project": ["Alpha", "Alpha", "Alpha", "Beta"],
+        "Date": ["2024-02-14", "2024-02-15", "2024-02-14", "2024-02-14"],
+        "Start Time": ["09:00", "09:00", "10:00", "08:00"],
+        "End Time": ["09:20", "10:00", "12:30", "09:00"],
+    })
+    insert_timesheets(parse_frame(df), get_sheet("Sheet1"))
+    url = reverse("bill_rate_system:bulk_edit")
+
+    def post(payload):
+        return client.post(url, json.dumps(payload), content_type="application/json")
+
+    with django_assert_max_num_queries(19):
+        response = post({"filters": {"sheet_name": "Sheet1", "project": "alpha"}, "changes": {"billable_rate": 50}})
+    assert response.json()["updated"] == 3
+    assert set(Timesheet.objects.filter(project__name="Alpha").values_list("billable_rate", "rate_cents")) == {
+        (Decimal("50.00"), 5000)
+    }
+
+    moved = list(Timesheet.objects.filter(employee_id=1).values_list("id", flat=True))
+    response = post({"filters": {"ids": moved}, "changes": {"project": "Beta", "date_shift": -1, "start_time": "08:30"}})
+    assert response.json()["updated"] == 2
+    assert sorted(Timesheet.objects.filter(employee_id=1).values_list(
+        "project_id", "date", "start_time", "end_time", "duration_minutes"
+    )) == [
+        (beta.id, date(2024, 2, 13), time(8, 30), time(9, 20), 50),
+        (beta.id, date(2024, 2, 14), time(8, 30), time(10, 0), 90),
+    ]
+
+    fields = ("project_id", "employee_id", "row_count", "total_minutes", "rate_minutes", "billable_rate")
+    incremental = list(InvoiceAggregate.objects.order_by("project_id", "employee_id").values_list(*fields))
+    rebuild_aggregates(get_sheet("Sheet1").id)
+    assert list(InvoiceAggregate.objects.order_by("project_id", "employee_id").values_list(*fields)) == incremental
+
+    response = post({"filters": {"sheet_name": "Sheet1"}, "changes": {"end_time": "08:15"}})
+    assert response.status_code == 400
+    assert len(response.json()["error"]) == 3
+    assert not Timesheet.objects.filter(end_time=time(8, 15)).exists()
+
+    response = post({"filters": {}, "changes": {"billable_rate": "abc", "colour": "red"}})
+    assert response.json()["error"] == [
+        "At least one filter is required.", "Unknown changes: colour.", "Invalid Billable Rate (abc).",
+    ]
+
+
+@pytest.mark.django_db
+def test_bulk_edit_shifts_consecutive_days(client):
+    from bill_rate_system.ingest import insert_timesheets
+    from bill_rate_system.models import DailyRevenue
+
+    user = User.objects.create_user(username="testuser", password="testpass")
+    client.force_login(user)
+    Project.objects.create(name="Alpha")
+    df = pd.DataFrame({
+        "Employee ID": [1, 1, 1, 1],
+        "Billable Rate": [30] * 4,
+        "Project": ["Alpha"] * 4,
+        "Date": ["2024-02-01", "2024-02-02", "2024-02-03", "2024-02-05"],
+        "Start Time": ["09:00"] * 4,
+        "End Time": ["10:00"] * 4,
+    })
+    insert_timesheets(parse_frame(df), get_sheet("Sheet1"))
+    url = reverse("bill_rate_system:bulk_edit")
+
+    def shift(days, date_to="2024-02-03"):
+        return client.post(url, json.dumps({
+            "filters": {"sheet_name": "Sheet1", "date_to": date_to}, "changes": {"date_shift": days},
+        }), content_type="application/json")
+
+    # The selected rows take each other's dates, in either direction.
+    assert shift(1).json()["updated"] == 3
+    assert shift(-1, date_to="2024-02-04").json()["updated"] == 3
+    assert shift(1).json()["updated"] == 3
+    assert sorted(Timesheet.objects.values_list("date", flat=True)) == [
+        date(2024, 2, 2), date(2024, 2, 3), date(2024, 2, 4), date(2024, 2, 5),
+    ]
+    assert sorted(DailyRevenue.objects.values_list("date", "row_count")) == [
+        (date(2024, 2, 2), 1), (date(2024, 2, 3), 1), (date(2024, 2, 4), 1), (date(2024, 2, 5), 1),
+    ]
+
+    # Only a row outside the selection is a conflict.
+    response = shift(1, date_to="2024-02-04")
+    assert response.status_code == 409
+    assert sorted(Timesheet.objects.values_list("date", flat=True))[0] == date(2024, 2, 2)
+
+
+@pytest.mark.django_db
+def test_timesheet_totals_match_incremental_aggregates(client, django_assert_max_num_queries):
+    from bill_rate_system.aggregates import rebuild_aggregates
+    from bill_rate_system.ingest import insert_timesheets
+    from bill_rate_system.models import InvoiceAggregate
+
+    Project.objects.create(name="Alpha")
+    df = pd.DataFrame({
+        "Employee ID": [1, 1, 1, 2],
+        "Billable Rate": [33.33, 33.33, 40.1, 45],
+        "Project": ["Alpha"] * 4,
+        "Date": ["2024-02-14", "2024-02-15", "2024-02-16", "2024-02-14"],
+        "Start Time": ["09:00", "09:00", "13:05", "10:00"],
+        "End Time": ["09:20", "10:07", "17:00", "12:30"],
+    })
+    insert_timesheets(parse_frame(df), get_sheet("Sheet1"))
+    fields = ("project_id", "employee_id", "row_count", "total_minutes", "rate_minutes", "billable_rate")
+    incremental = list(InvoiceAggregate.objects.order_by("employee_id").values_list(*fields))
+
+    rebuild_aggregates(get_sheet("Sheet1").id)
+    assert list(InvoiceAggregate.objects.order_by("employee_id").values_list(*fields)) == incremental
+
+    # Reading an invoice never writes; missing aggregates are repaired by the command.
+    InvoiceAggregate.objects.all().delete()
+    user = User.objects.create_user(username="testuser", password="testpass")
+    client.force_login(user)
+    response = client.get(reverse("bill_rate_system:invoice_details", args=["Sheet1", "Alpha"]))
+    assert response.context["invoices"] == []
+    assert not InvoiceAggregate.objects.exists()
+
+    call_command("rebuild_aggregates", stdout=io.StringIO())
+    assert list(InvoiceAggregate.objects.order_by("employee_id").values_list(*fields)) == incremental
+    with django_assert_max_num_queries(12):
+        response = client.get(reverse("bill_rate_system:invoice_details", args=["Sheet1", "Alpha"]))
+    assert response.context["total_cost"] == Decimal("205.39") + Decimal("112.50")
+
+    # Hours and cost are rounded once per employee, not per row as before the
+    # aggregates: three 20 minute rows bill 1.0 hour rather than 3 x 0.33.
+    third = pd.DataFrame({
+        "Employee ID": [3, 3, 3],
+        "Billable Rate": [10, 10, 10],
+        "Project": ["Alpha"] * 3,
+        "Date": ["2024-02-14", "2024-02-15", "2024-02-16"],
+        "Start Time": ["09:00"] * 3,
+        "End Time": ["09:20"] * 3,
+    })
+    insert_timesheets(parse_frame(third), get_sheet("Sheet1"))
+    aggregate = InvoiceAggregate.objects.get(employee_id=3)
+    assert (aggregate.hours_worked, aggregate.cost) == (1.0, Decimal("10.00"))
+
+
+@pytest.mark.django_db
+def test_timesheets_view_groups_sheets_in_one_query(client, django_assert_max_num_queries):
+    from bill_rate_system.aggregates import rebuild_aggregates
+
+    user = User.objects.create_user(username="testuser", password="testpass")
+    client.force_login(user)
+    alpha = Project.objects.create(name="Alpha")
+    beta = Project.objects.create(name="Beta")
+    for sheet_index in range(30):
+        for employee_id, project in ((1, alpha), (2, beta)):
+            Timesheet.objects.create(
+                employee_id=employee_id,
+                project=project,
+                date=date(2024, 1, 1 + sheet_index),
+                start_time=time(9, 0),
+                end_time=time(10, 30),
+                billable_rate=50,
+                sheet=get_sheet(f"Sheet{sheet_index:02d}"),
+            )
+    for sheet in Sheet.objects.all():
+        rebuild_aggregates(sheet.id)
+
+    with django_assert_max_num_queries(6):
+        response = client.get(reverse("bill_rate_system:timesheets"), {"sort": "uploaded_at", "page": 2})
+
+    page = response.context["page"]
+    assert page.paginator.count == 30
+    assert [sheet.name for sheet in page] == ["Sheet25", "Sheet26", "Sheet27", "Sheet28", "Sheet29"]
+    assert (page[0].row_count, page[0].project_count, page[0].total_hours) == (2, 2, 3.0)
+
+
+@pytest.mark.django_db
+def test_timesheet_rows_pages_with_cursor(client):
+    user = User.objects.create_user(username="testuser", password="testpass")
+    client.force_login(user)
+    alpha = Project.objects.create(name="Alpha")
+    beta = Project.objects.create(name="Beta")
+    for employee_id in range(1, 8):
+        Timesheet.objects.create(
+            employee_id=employee_id,
+            project=alpha if employee_id % 2 else beta,
+            date=date(2024, 2, 14),
+            start_time=time(9, 0),
+            end_time=time(17, 0),
+            billable_rate=50,
+            sheet=get_sheet("Sheet1"),
+        )
+    url = reverse("bill_rate_system:timesheet_rows", args=["Sheet1"])
+
+    first = client.get(url, {"sort": "employee_id", "dir": "desc", "length": 3, "draw": 4}).json()
+    assert [row["employee_id"] for row in first["data"]] == [7, 6, 5]
+    assert (first["draw"], first["recordsTotal"], first["recordsFiltered"]) == (4, 7, 7)
+
+    second = client.get(url, {"sort": "employee_id", "dir": "desc", "length": 3, "cursor": first["next_cursor"]}).json()
+    assert [row["employee_id"] for row in second["data"]] == [4, 3, 2]
+
+    filtered = client.get(url, {"sort": "project", "search": "bet", "length": 10}).json()
+    assert [row["employee_id"] for row in filtered["data"]] == [2, 4, 6]
+    assert filtered["recordsFiltered"] == 3 and filtered["next_cursor"] is None
+    assert filtered["data"][0]["project"] == "Beta"
+
+    assert client.get(url, {"sort": "billable_rate"}).status_code == 400
+    assert client.get(url, {"date_from": "garbage"}).status_code == 400
+    assert client.get(url, {"date_to": "2024-02-30"}).status_code == 400
+    assert client.get(url, {"date_from": "2024-02-14", "date_to": "2024-02-14"}).json()["recordsFiltered"] == 7
+
+
+def assert_timesheet_queries_use_indexes(queries):
+    from django.db import connection
+
+    checked = 0
+    for query in queries:
+        sql = query["sql"]
+        if "bill_rate_system_timesheet" not in sql or not sql.startswith(("SELECT", "UPDATE")):
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            plan = [row[-1] for row in cursor.fetchall()]
+        full_scans = [step for step in plan if step.startswith("SCAN bill_rate_system_timesheet") and "INDEX" not in step]
+        assert not full_scans, f"{sql}\n{plan}"
+        checked += 1
+    return checked
+
+
+@pytest.mark.django_db
+def test_timesheet_views_use_indexes(client):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    if connection.vendor != "sqlite":
+        pytest.skip("query plans are checked with SQLite's EXPLAIN QUERY PLAN")
+
+    user = User.objects.create_user(username="testuser", password="testpass")
+    client.force_login(user)
+    project = Project.objects.create(name="Alpha")
+    timesheet = Timesheet.objects.create(
+        employee_id=1,
+        project=project,
+        date=date(2024, 2, 14),
+        start_time=time(9, 0),
+        end_time=time(17, 0),
+        billable_rate=50,
+        sheet=get_sheet("Sheet1"),
+    )
+
+    with CaptureQueriesContext(connection) as context:
+        client.get(reverse("bill_rate_system:timesheet_rows", args=["Sheet1"]))
+    assert assert_timesheet_queries_use_indexes(context.captured_queries) >= 3
+
+    # Invoices are read from the aggregates only.
+    with CaptureQueriesContext(connection) as context:
+        client.get(reverse("bill_rate_system:invoice_details", args=["Sheet1", "Alpha"]))
+    assert not [query for query in context.captured_queries if "bill_rate_system_timesheet" in query["sql"]]
+
+    # Listing and renaming sheets only read and write the sheet table.
+    with CaptureQueriesContext(connection) as context:
+        client.get(reverse("bill_rate_system:timesheets"))
+        client.post(reverse("bill_rate_system:edit_timesheet_name", args=[timesheet.sheet_id]), {"sheet_name": "Sheet2"})
+    assert not [query for query in context.captured_queries if "bill_rate_system_timesheet" in query["sql"]]
+    assert Timesheet.objects.filter(sheet__name="Sheet2").count() == 1
+
+    plan = Timesheet.objects.filter(project=project, date__range=(date(2024, 1, 1), date(2024, 12, 31))).explain()
+    assert "timesheet_project_date_idx" in plan
+
+
+@pytest.mark.django_db
+def test_project_cache_is_reused_and_invalidated(client, django_assert_num_queries):
+    from bill_rate_system.cache import invalidate_projects, project_ids
+
+    invalidate_projects()
+    alpha = Project.objects.create(name="Alpha")
+    assert project_ids({"Alpha"}) == {"Alpha": alpha.id}
+    with django_assert_num_queries(0):
+        assert project_ids({"Alpha"}) == {"Alpha": alpha.id}
+
+    alpha.name = "Gamma"
+    alpha.save()
+    with django_assert_num_queries(1):
+        assert project_ids({"Alpha", "Gamma"}) == {"Gamma": alpha.id}
+
+    user = User.objects.create_user(username="testuser", password="testpass")
+    client.force_login(user)
+    client.post(reverse("bill_rate_system:project_add"), {"firstname": "Delta"})
+    with django_assert_num_queries(1):
+        assert set(project_ids({"Delta"})) == {"Delta"}
+
+
+@pytest.mark.django_db
+def test_process_file_reuses_parsed_upload(client, settings, monkeypatch):
+    from bill_rate_system import ingest
+    from bill_rate_system.uploads import has_parsed
+
+    settings.INGEST_JOBS_EAGER = True
+    client.force_login(User.objects.create_user(username="testuser", password="testpass"))
+    Project.objects.create(name="Test Project")
+    csv_content = b"Employee ID,Billable Rate,Project,Date,Start Time,End Time\n123,50,Test Project,14/02/2024,9:00 AM,5:00 PM\n3000000000,60,test project,2024-02-14,09:00,12:30"
+    csv_file = SimpleUploadedFile("test_parsed.csv", csv_content, content_type="text/csv")
+    upload = client.post(reverse('bill_rate_system:upload_temp_file'), {'file': csv_file}).json()
+    assert has_parsed(upload["upload_id"])
+
+    def read_csv_again(*args, **kwargs):
+        raise AssertionError("process_file parsed the CSV again")
+
+    monkeypatch.setattr(ingest, "read_csv_chunks", read_csv_again)
+    try:
+        response = client.post(reverse('bill_rate_system:process_file'), json.dumps(upload), content_type="application/json")
+        status = client.get(response.json()["status_url"]).json()
+    finally:
+        os.remove(os.path.join("uploads", upload["file_name"]))
+
+    assert status["status"] == "done" and status["rows_inserted"] == 2
+    assert sorted(Timesheet.objects.values_list("employee_id", "date", "start_time", "end_time")) == [
+        (123, date(2024, 2, 14), time(9, 0), time(17, 0)),
+        # Employee IDs past the int32 range survive the stored chunks unchanged.
+        (3000000000, date(2024, 2, 14), time(9, 0), time(12, 30)),
+    ]
+    assert not has_parsed(upload["upload_id"])
+
+
+@pytest.mark.django_db
+def test_process_file_skips_content_already_ingested(client, settings):
+    from django.core.cache import caches
+    from bill_rate_system.cache import invoice_key, load_invoice
+    from bill_rate_system.models import IngestJob
+
+    settings.INGEST_JOBS_EAGER = True
+    client.force_login(User.objects.create_user(username="testuser", password="testpass"))
+    Project.objects.create(name="Test Project")
+    file_path = os.path.join("uploads", "test_repeat.csv")
+    header = "Employee ID,Billable Rate,Project,Date,Start Time,End Time\n"
+    first_rows = "123,50,Test Project,2024-02-14,09:00,17:00\n124,60,Test Project,2024-02-14,09:00,12:00\n"
+
+    def process(content):
+        with open(file_path, "w") as f:
+            f.write(content)
+        response = client.post(reverse('bill_rate_system:process_file'), json.dumps({"file_name": "test_repeat.csv"}), content_type="application/json")
+        return client.get(response.json()["status_url"]).json()
+
+    try:
+        first = process(header + first_rows)
+        repeat = process(header + first_rows)
+        extended = process(header + first_rows + "125,40,Test Project,2024-02-15,10:00,11:30\n")
+        invoice = load_invoice(client.session["invoice_key"])
+
+        # A reused job whose invoice expired from the cache gets it computed again.
+        caches["invoices"].delete(invoice_key(first["job_id"]))
+        expired = process(header + first_rows)
+        restored = load_invoice(client.session["invoice_key"])
+
+        # Once the sheet is deleted its rows are gone, so the file is ingested again.
+        Sheet.objects.filter(jobs__id=first["job_id"]).delete()
+        again = process(header + first_rows)
+    finally:
+        os.remove(file_path)
+
+    assert repeat["job_id"] == first["job_id"]
+    assert extended["rows_skipped"] == 2
+    assert extended["rows_processed"] == 1 and extended["rows_inserted"] == 1 and extended["duplicates"] == 0
+    assert sorted(row["Employee ID"] for row in invoice["Test Project"]) == [123, 124, 125]
+
+    assert expired["job_id"] == first["job_id"]
+    assert sorted(row["Employee ID"] for row in restored["Test Project"]) == [123, 124]
+
+    assert again["job_id"] not in (first["job_id"], extended["job_id"])
+    assert again["status"] == "done" and again["rows_inserted"] == 2
+    assert IngestJob.objects.count() == 3
+    assert Timesheet.objects.count() == 3
+
+
+def test_fingerprint_hashes_prefixes_in_one_read(tmp_path):
+    import hashlib
+    from bill_rate_system.uploads import fingerprint, is_line_boundary
+
+    path = tmp_path / "data.csv"
+    content = b"a,b\n1,2\n3,4"
+    path.write_bytes(content)
+
+    digest, size, prefixes = fingerprint(path, [4, 8, 99])
+    assert digest == hashlib.sha256(content).hexdigest() and size == len(content)
+    assert prefixes == {4: hashlib.sha256(content[:4]).hexdigest(), 8: hashlib.sha256(content[:8]).hexdigest()}
+    assert is_line_boundary(path, 8) and is_line_boundary(path, 7) and not is_line_boundary(path, 6)
+
+
+@pytest.mark.django_db
+def test_upload_temp_file_streams_to_disk_and_stops_at_first_bad_chunk(client, monkeypatch):
+    from bill_rate_system import views
+
+    Project.objects.create(name="Test Project")
+    chunks_read = []
+
+    def small_chunks(source):
+        for chunk in pd.read_csv(source, chunksize=2):
+            chunks_read.append(len(chunk))
+            yield chunk
+
+    monkeypatch.setattr(views, "read_csv_chunks", small_chunks)
+    header = b"Employee ID,Billable Rate,Project,Date,Start Time,End Time\n"
+    row = b"123,50,Test Project,2024-02-14,09:00,17:00\n"
+
+    bad_file = SimpleUploadedFile("test_bad_stream.csv", header + b"-1,50,Test Project,2024-02-14,09:00,17:00\n" + row * 20, content_type="text/csv")
+    response = client.post(reverse('bill_rate_system:upload_temp_file'), {'file': bad_file})
+    assert response.status_code == 400
+    assert response.json()["error"] == ["Row 1: Invalid Employee ID (-1)."]
+    assert chunks_read == [2]
+    assert not os.path.exists(os.path.join("uploads", "test_bad_stream.csv"))
+
+    content = header + row * 5
+    good_file = SimpleUploadedFile("test_good_stream.csv", content, content_type="text/csv")
+    response = client.post(reverse('bill_rate_system:upload_temp_file'), {'file': good_file})
+    assert response.status_code == 200
+    discard_parsed(response.json()["upload_id"])
+    path = os.path.join("uploads", response.json()["file_name"])
+    with open(path, "rb") as f:
+        assert f.read() == content
+    os.remove(path)
+    assert not [name for name in os.listdir("uploads") if name.endswith(".part")]
+
+
+@pytest.mark.django_db
+def test_timesheet_duration_and_rate_cents_are_stored():
+    import importlib
+    from django.apps import apps
+
+    project = Project.objects.create(name="Test Project")
+    timesheet = Timesheet.objects.create(
+        employee_id=1, billable_rate=Decimal("19.99"), project=project, date=date(2024, 2, 14),
+        start_time=time(9, 15), end_time=time(17, 0), sheet=get_sheet("sheetA")
+    )
+    assert (timesheet.duration_minutes, timesheet.rate_cents) == (465, 1999)
+
+    Timesheet.objects.update(duration_minutes=0, rate_cents=0)
+    migration = importlib.import_module("bill_rate_system.migrations.0010_timesheet_duration_rate_cents")
+    migration.fill_totals(apps, None)
+    assert Timesheet.objects.values_list("duration_minutes", "rate_cents").get() == (465, 1999)
+
+
+@pytest.mark.django_db
+def test_export_timesheets_and_invoice_stream_csv(client):
+    user = User.objects.create_user(username="testuser", password="testpass")
+    client.login(username="testuser", password="testpass")
+    project = Project.objects.create(name="Test Project")
+    for employee_id, day in [(1, date(2024, 1, 5)), (2, date(2024, 3, 1)), (2, date(2024, 3, 2))]:
+        Timesheet.objects.create(
+            employee_id=employee_id, billable_rate=Decimal("50.00"), project=project, date=day,
+            start_time=time(9, 0), end_time=time(10, 30), sheet=get_sheet("sheetA")
+        )
+
+    response = client.get(reverse('bill_rate_system:export_sheet', args=["sheetA"]), {"start": "2024-02-01"})
+    assert response.streaming
+    assert response["Content-Disposition"] == 'attachment; filename="sheetA.csv"'
+    assert b"".join(response.streaming_content).decode().splitlines() == [
+        "Employee ID,Billable Rate,Project,Date,Start Time,End Time",
+        "2,50.00,Test Project,2024-03-01,09:00,10:30",
+        "2,50.00,Test Project,2024-03-02,09:00,10:30",
+    ]
+
+    # Rows created directly have no aggregates, and exporting does not write them.
+    response = client.get(reverse('bill_rate_system:export_invoice', args=["sheetA"]))
+    assert b"".join(response.streaming_content).decode().splitlines() == ["Project,Employee ID,Hours Worked,Unit Price,Cost"]
+    assert not get_sheet("sheetA").aggregates.exists()
+
+    call_command("rebuild_aggregates", "sheetA", stdout=io.StringIO())
+    response = client.get(reverse('bill_rate_system:export_invoice', args=["sheetA"]))
+    assert b"".join(response.streaming_content).decode().splitlines() == [
+        "Project,Employee ID,Hours Worked,Unit Price,Cost",
+        "Test Project,1,1.5,50.00,75.00",
+        "Test Project,2,3.0,50.00,150.00",
+    ]
+
+    response = client.get(reverse('bill_rate_system:export_timesheets'), {"end": "31/12/2024"})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_upload_batch_validates_files_in_parallel_and_reports_once(client, settings):
+    import io
+    import zipfile
+    from bill_rate_system.models import IngestJob
+
+    settings.INGEST_JOBS_EAGER = True
+    settings.BATCH_WORKERS = 2
+    Project.objects.create(name="Test Project")
+    header = "Employee ID,Billable Rate,Project,Date,Start Time,End Time\n"
+    shared_row = "1,50,Test Project,2024-02-14,09:00,17:00\n"
+
+    # Members with the same base name, and a file named like an earlier upload.
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("alpha/test_batch_c.csv", header + shared_row + "3,50,Test Project,2024-02-14,09:00,10:00\n")
+        zf.writestr("beta/test_batch_c.csv", header + "5,50,Test Project,2024-02-14,09:00,10:00\n")
+        zf.writestr("notes.txt", "ignored")
+    files = [
+        SimpleUploadedFile("test_batch_a.csv", (header + shared_row + "2,50,Test Project,2024-02-14,09:00,12:00\n").encode()),
+        SimpleUploadedFile("test_batch_b.csv", (header + "4,50,Unknown,2024-02-14,09:00,12:00\n").encode()),
+        SimpleUploadedFile("test_batch.zip", archive.getvalue()),
+        SimpleUploadedFile("test_batch.txt", b"not a csv"),
+    ]
+    existing = os.path.join("uploads", "test_batch_a.csv")
+    with open(existing, "w") as f:
+        f.write("an earlier upload")
+    before = set(os.listdir("uploads"))
+    try:
+        response = client.post(reverse('bill_rate_system:upload_batch'), {'files': files})
+        published = set(os.listdir("uploads")) - before
+        with open(existing) as f:
+            assert f.read() == "an earlier upload"
+    finally:
+        os.remove(existing)
+        for name in set(os.listdir("uploads")) - before:
+            os.remove(os.path.join("uploads", name))
+
+    report = response.json()
+    assert response.status_code == 200
+    assert (report["accepted"], report["rejected"]) == (3, 2)
+    by_name = {entry["file_name"]: entry for entry in report["files"]}
+    assert by_name["test_batch_a.csv"]["job_status"] == "done"
+    assert by_name["alpha/test_batch_c.csv"]["job_status"] == "done"
+    assert by_name["beta/test_batch_c.csv"]["job_status"] == "done"
+    assert "not registered" in by_name["test_batch_b.csv"]["error"]
+    assert by_name["test_batch.txt"]["status"] == "rejected"
+    assert IngestJob.objects.count() == 3
+    assert sorted(Timesheet.objects.values_list("employee_id", flat=True)) == [1, 2, 3, 5]
+
+    # Accepted files are published under their own names; rejected ones are removed.
+    assert sorted(name.split("_", 1)[1] for name in published) == ["test_batch_a.csv", "test_batch_c.csv", "test_batch_c.csv"]
+    assert not [name for name in published if name.endswith(".part")]
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_exposes_view_and_stage_histograms(client):
+    user = User.objects.create_user(username="testuser", password="testpass")
+    client.login(username="testuser", password="testpass")
+    Project.objects.create(name="Test Project")
+    client.get(reverse('bill_rate_system:timesheets'))
+    csv_file = SimpleUploadedFile("test_metrics.csv", b"Employee ID,Billable Rate,Project,Date,Start Time,End Time\n1,50,Test Project,2024-02-14,09:00,17:00", content_type="text/csv")
+    upload = client.post(reverse('bill_rate_system:upload_temp_file'), {'file': csv_file}).json()
+    discard_parsed(upload["upload_id"])
+    os.remove(os.path.join("uploads", upload["file_name"]))
+
+    response = client.get(reverse('metrics'))
+    body = response.content.decode()
+    assert response.status_code == 200 and response["Content-Type"].startswith("text/plain")
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'http_request_db_queries_count{view="bill_rate_system:timesheets"}' in body
+    assert 'http_response_size_bytes_bucket{view="bill_rate_system:timesheets",le="+Inf"}' in body
+    assert 'pipeline_stage_duration_seconds_count{stage="parse"}' in body
+    assert 'pipeline_stage_duration_seconds_count{stage="validate"}' in body
+
+    assert client.get(reverse('metrics'), REMOTE_ADDR="10.0.0.5").status_code == 403
+
+
+def test_histogram_buckets_are_cumulative():
+    from bill_rate_system.metrics import Histogram
+
+    histogram = Histogram("job_rows", "Rows per job.", "kind", (10, 100))
+    for value in (5, 50, 500, 10):
+        histogram.observe('csv', value)
+    assert histogram.render().splitlines()[2:] == [
+        'job_rows_bucket{kind="csv",le="10"} 2',
+        'job_rows_bucket{kind="csv",le="100"} 3',
+        'job_rows_bucket{kind="csv",le="+Inf"} 4',
+        'job_rows_sum{kind="csv"} 565',
+        'job_rows_count{kind="csv"} 4',
+    ]
+
+
+@pytest.mark.django_db
+def test_staff_can_profile_a_request_and_browse_profiles(client, settings, tmp_path):
+    settings.PROFILE_DIR = str(tmp_path)
+    Project.objects.create(name="Test Project")
+    user = User.objects.create_user(username="testuser", password="testpass")
+    client.login(username="testuser", password="testpass")
+
+    client.get(reverse('bill_rate_system:invoice_details', args=["sheetA", "Test Project"]), HTTP_X_PROFILE="1")
+    assert os.listdir(tmp_path) == []
+    assert client.get(reverse('bill_rate_system:profile_list')).status_code == 302
+
+    user.is_staff = True
+    user.save()
+    client.get(reverse('bill_rate_system:invoice_details', args=["sheetA", "Test Project"]), HTTP_X_PROFILE="1")
+    [name] = os.listdir(tmp_path)
+    assert name.startswith("invoice_details-") and name.endswith(".prof")
+
+    response = client.get(reverse('bill_rate_system:profile_list'))
+    assert [profile["name"] for profile in response.context["profiles"]] == [name]
+    response = client.get(reverse('bill_rate_system:profile_detail', args=[name]))
+    assert any("invoice_details" in function["function"] for function in response.context["functions"])
+    assert client.get(reverse('bill_rate_system:profile_detail', args=["..%2Fdb.sqlite3"])).status_code == 404
+
+
+@pytest.mark.django_db
+def test_revenue_report_sums_daily_rollups_kept_up_to_date(client, django_assert_max_num_queries):
+    from bill_rate_system.ingest import insert_timesheets
+    from bill_rate_system.models import DailyRevenue, MonthlyRevenue
+    from bill_rate_system.revenue import rebuild_daily_revenue
+
+    user = User.objects.create_user(username="testuser", password="testpass")
+    client.force_login(user)
+    Project.objects.create(name="Alpha")
+    Project.objects.create(name="Beta")
+    first = pd.DataFrame({
+        "Employee ID": [1, 1, 2],
+        "Billable Rate": [30, 30, 45],
+        "Project": ["Alpha", "Alpha", "Beta"],
+        "Date": ["2024-01-30", "2024-02-02", "2024-02-02"],
+        "Start Time": ["09:00", "09:00", "10:00"],
+        "End Time": ["10:00", "11:30", "12:00"],
+    })
+    second = pd.DataFrame({
+        "Employee ID": [1, 3],
+        "Billable Rate": [30, 20],
+        "Project": ["Alpha", "Alpha"],
+        "Date": ["2024-01-30", "2024-03-01"],
+        "Start Time": ["13:00", "09:00"],
+        "End Time": ["14:00", "09:30"],
+    })
+    insert_timesheets(parse_frame(first), get_sheet("Sheet1"))
+    insert_timesheets(parse_frame(second), get_sheet("Sheet2"))
+
+    timesheet = Timesheet.objects.get(employee_id=2)
+    client.post(reverse("bill_rate_system:edit_timesheet", args=[timesheet.id]), {
+        "billable_rate": "60", "date": "2024-03-05", "start_time": "10:00", "end_time": "11:00",
+        "project": timesheet.project_id,
+    })
+    client.post(reverse("bill_rate_system:bulk_edit"), json.dumps({
+        "filters": {"employee_ids": [3]}, "changes": {"date_shift": 1},
+    }), content_type="application/json")
+
+    fields = ("project_id", "employee_id", "date", "row_count", "total_minutes", "rate_cent_minutes")
+    incremental = sorted(DailyRevenue.objects.values_list(*fields))
+    assert (date(2024, 1, 30), 2, 120) == incremental[0][2:5]
+    monthly_fields = ("project_id", "employee_id", "month", "row_count", "total_minutes", "rate_cent_minutes")
+    monthly = sorted(MonthlyRevenue.objects.values_list(*monthly_fields))
+    rebuild_daily_revenue(date(2024, 1, 1), date(2024, 12, 31))
+    assert sorted(DailyRevenue.objects.values_list(*fields)) == incremental
+    assert sorted(MonthlyRevenue.objects.values_list(*monthly_fields)) == monthly
+
+    url = reverse("bill_rate_system:revenue_report_data")
+    with django_assert_max_num_queries(4):
+        response = client.get(url, {"start": "2024-01-01", "end": "2024-12-31", "group_by": "project,month"})
+    assert response.json()["rows"] == [
+        {"project": "Alpha", "month": "2024-01", "rows": 2, "hours": 2.0, "cost": "60.00"},
+        {"project": "Alpha", "month": "2024-02", "rows": 1, "hours": 2.5, "cost": "75.00"},
+        {"project": "Alpha", "month": "2024-03", "rows": 1, "hours": 0.5, "cost": "10.00"},
+        {"project": "Beta", "month": "2024-03", "rows": 1, "hours": 1.0, "cost": "60.00"},
+    ]
+    assert response.json()["totals"] == {"rows": 5, "hours": 6.0, "cost": "205.00"}
+
+    response = client.get(url, {"start": "2024-02-01", "end": "2024-03-01", "group_by": "employee"})
+    assert response.json()["rows"] == [{"employee_id": 1, "rows": 1, "hours": 2.5, "cost": "75.00"}]
+
+    # January and March are partial and summed from the days, February from its month.
+    response = client.get(url, {"start": "2024-01-30", "end": "2024-03-02", "group_by": "month"})
+    assert response.json()["rows"] == [
+        {"month": "2024-01", "rows": 2, "hours": 2.0, "cost": "60.00"},
+        {"month": "2024-02", "rows": 1, "hours": 2.5, "cost": "75.00"},
+        {"month": "2024-03", "rows": 1, "hours": 0.5, "cost": "10.00"},
+    ]
+
+    response = client.get(url, {"start": "2024-03-01", "end": "2024-01-01"})
+    assert response.status_code == 400
+    assert client.get(url, {"group_by": "week"}).status_code == 400
+
+    response = client.get(reverse("bill_rate_system:revenue_report"), {"start": "2024-01-01", "end": "2024-12-31"})
+    assert response.status_code == 200
+    assert response.context["totals"]["cost"] == Decimal("205.00")